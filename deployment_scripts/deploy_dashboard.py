@@ -1,4 +1,10 @@
 import os
+import errno
+import grp
+import hashlib
+import functools
+import pwd
+import re
 import shutil
 import subprocess
 import getpass
@@ -13,6 +19,21 @@ logger = logging.getLogger(__name__)
 # --- Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DASHBOARD_APP_SRC_DIR = os.path.join(os.path.dirname(BASE_DIR), "main_dashboard")
+PIP_WHEEL_CACHE_DIR = "/var/cache/pip-wheels" # Persists downloaded wheels across redeploys
+DEPS_CACHE_DIR = "/var/cache/cluster-gpu-monitor" # Markers for dependency probes that already succeeded
+MIN_PIP_VERSION = (24, 0) # Skip 'pip install --upgrade pip' when the venv already has at least this version
+COPY_BUFFER_SIZE = 1 << 20 # 1 MiB buffer for the userspace copy fallback (shutil defaults to 64 KiB)
+_TEMPLATE_RE = re.compile(r"\{\{(\w+)\}\}") # {{KEY}} placeholders in the systemd template
+_which = functools.lru_cache(maxsize=None)(shutil.which) # PATH lookups don't change during a deployment run
+
+def render_template(template, mapping):
+    """Substitutes every {{KEY}} placeholder in a single pass; unknown keys raise instead of leaking into the output."""
+    def substitute(match):
+        key = match.group(1)
+        if key not in mapping:
+            raise KeyError(f"Unrendered placeholder {{{{{key}}}}} in template (known keys: {', '.join(sorted(mapping))})")
+        return mapping[key]
+    return _TEMPLATE_RE.sub(substitute, template)
 
 def check_sudo():
     """Checks if the script is run with sudo privileges."""
@@ -22,22 +43,12 @@ def check_sudo():
         sys.exit(1)
     logger.info("Sudo privileges detected.")
 
-def run_command(command, check=True, capture_output=False, text=True, shell=False, cwd=None, verbose=True):
-    """Helper function to run shell commands."""
+def run_command(command, *, check=True, capture_output=False, cwd=None, verbose=True):
+    """Helper function to run external commands. `command` is always an argument list (never run through a shell)."""
     if verbose:
-        logger.info(f"Executing: {' '.join(command) if isinstance(command, list) else command}")
+        logger.info(f"Executing: {' '.join(command)}")
     try:
-        # For subprocess.run, if shell=True, command should be a string.
-        # If shell=False, command should be a list.
-        cmd_to_run = command
-        if shell and isinstance(command, list):
-            cmd_to_run = ' '.join(command)
-        elif not shell and isinstance(command, str):
-            # This case is problematic, but we'll try to split. Better to pass lists for non-shell.
-            cmd_to_run = command.split()
-
-        process = subprocess.run(cmd_to_run, check=check, capture_output=capture_output, text=text, shell=shell, cwd=cwd)
-        return process
+        return subprocess.run(command, check=check, capture_output=capture_output, text=True, cwd=cwd)
     except subprocess.CalledProcessError as e:
         logger.error(f"Command failed: {e}")
         if capture_output:
@@ -45,23 +56,48 @@ def run_command(command, check=True, capture_output=False, text=True, shell=Fals
             logger.error(f"Stderr: {e.stderr}" if e.stderr else "No stderr")
         raise
     except FileNotFoundError as e: # Handle command not found
-        logger.error(f"Command not found: {command[0] if isinstance(command, list) else command.split()[0]}. Ensure it's installed and in PATH.")
+        logger.error(f"Command not found: {command[0]}. Ensure it's installed and in PATH.")
         raise
 
 
+def _host_marker_path(python_path):
+    """Marker file recording that all dependency checks passed, keyed on the OS release, kernel and Python binary."""
+    try:
+        with open("/etc/os-release", "rb") as f:
+            os_release = f.read()
+    except OSError:
+        os_release = b""
+    real_path = os.path.realpath(python_path)
+    fingerprint = os_release + os.uname().release.encode() + f"{real_path}:{os.path.getmtime(real_path)}".encode()
+    return os.path.join(DEPS_CACHE_DIR, f"host-ok.{hashlib.sha1(fingerprint).hexdigest()}")
+
+def _touch_marker(marker_path):
+    try:
+        os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+        with open(marker_path, "a"):
+            pass
+    except OSError as e:
+        logger.debug(f"Could not write dependency cache marker {marker_path}: {e}")
+
 def check_system_dependencies(python_executable="python3"):
     """Checks for necessary system-level dependencies."""
     logger.info("Checking for system dependencies...")
     missing_deps = []
 
+    # Skip all probes if they already passed on this OS release / kernel / Python binary.
+    python_path = _which(python_executable)
+    host_marker = _host_marker_path(python_path) if python_path else None
+    if host_marker and os.path.exists(host_marker):
+        logger.info("System dependencies previously verified on this host, skipping checks.")
+        return True
+
     # 1. Check for Python executable
-    if not shutil.which(python_executable):
+    if not _which(python_executable):
         missing_deps.append(f"Python interpreter: '{python_executable}' (not found in PATH)")
     else:
-        logger.info(f"Python interpreter '{python_executable}' found at {shutil.which(python_executable)}")
+        logger.info(f"Python interpreter '{python_executable}' found at {_which(python_executable)}")
 
         # 2. Check for venv module availability for the specified Python
-        # A more direct check for venv capability:
         try:
             # Use a very simple venv command, like creating a dummy venv and immediately cleaning it up,
             # or just checking help. Checking help is less intrusive.
@@ -78,10 +114,14 @@ def check_system_dependencies(python_executable="python3"):
 
 
     # 3. Check for Git
-    if not shutil.which("git"):
+    if not _which("git"):
         missing_deps.append("Git (command: 'git') (not found in PATH. On Debian/Ubuntu, try: sudo apt install git)")
     else:
-        logger.info(f"Git found at {shutil.which('git')}")
+        logger.info(f"Git found at {_which('git')}")
+
+    # 4. Optional: uv (faster resolver/installer). pip is used when it is absent.
+    if _which("uv"):
+        logger.info(f"uv found at {_which('uv')}, it will be used to install Python dependencies.")
 
     if missing_deps:
         logger.error("---------------------------------------------------------")
@@ -92,61 +132,175 @@ def check_system_dependencies(python_executable="python3"):
         sys.exit(1)
 
     logger.info("All checked system dependencies are present.")
+    _touch_marker(host_marker)
     return True
 
 
-def setup_dashboard_files(deploy_path, service_user):
+def _copyfile_readinto(src, dst, length=COPY_BUFFER_SIZE):
+    """Userspace file copy reusing one preallocated buffer (readinto avoids a new bytes object per read)."""
+    buf = bytearray(length)
+    mv = memoryview(buf)
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        while True:
+            n = fsrc.readinto(mv)
+            if not n:
+                break
+            fdst.write(mv[:n])
+
+def _fast_copy(src, dst):
+    """Copies a single file in-kernel with copy_file_range (reflink on btrfs/XFS), falling back to a buffered userspace copy."""
+    if hasattr(os, "copy_file_range"):
+        fd_in = os.open(src, os.O_RDONLY)
+        try:
+            fd_out = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                remaining = os.fstat(fd_in).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fd_in, fd_out, remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            except OSError as e:
+                # Cross-device or unsupported filesystem: use the regular userspace copy below.
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+            else:
+                shutil.copymode(src, dst)
+                return dst
+            finally:
+                os.close(fd_out)
+        finally:
+            os.close(fd_in)
+
+    _copyfile_readinto(src, dst)
+    shutil.copymode(src, dst)
+    return dst
+
+def _write_file_atomic(path, content, mode=0o644):
+    """Writes content to a temporary sibling, fsyncs it and renames it over path, so readers never see a partial file."""
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        data = memoryview(content.encode())
+        while data:
+            data = data[os.write(fd, data):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+def _chown_r(path, uid, gid):
+    """Recursively changes ownership in-process (equivalent of 'chown -R', without following symlinks)."""
+    os.chown(path, uid, gid)
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            os.chown(os.path.join(root, name), uid, gid, follow_symlinks=False)
+
+def resolve_service_user(service_user):
+    """Looks up the uid/gid of the service user once, exiting early if the user does not exist."""
+    try:
+        pw = pwd.getpwnam(service_user)
+    except KeyError:
+        logger.error(f"Service user '{service_user}' does not exist on this system.")
+        sys.exit(1)
+    return pw.pw_uid, pw.pw_gid
+
+def setup_dashboard_files(deploy_path, service_user, uid, gid):
     """Creates deployment directory and copies application files."""
     logger.info(f"Setting up dashboard files at {deploy_path}")
     if not os.path.exists(deploy_path):
-        run_command(["mkdir", "-p", deploy_path])
+        os.makedirs(deploy_path, exist_ok=True)
         logger.info(f"Created directory: {deploy_path}")
     else:
         logger.info(f"Deployment directory {deploy_path} already exists. Files will be overwritten.")
 
-    # Avoid copying static/templates into themselves if deploy_path is inside DASHBOARD_APP_SRC_DIR
-    for item in os.listdir(DASHBOARD_APP_SRC_DIR):
-        s = os.path.join(DASHBOARD_APP_SRC_DIR, item)
-        d = os.path.join(deploy_path, item)
-        # Skip copying if source and destination are the same directory (prevents static/static, etc.)
-        if os.path.abspath(s) == os.path.abspath(d):
-            logger.info(f"Skipping copy of {s} into itself.")
-            continue
-        if os.path.isdir(s):
-            # If destination exists and is a directory, remove it first to avoid nested copy
-            if os.path.exists(d) and os.path.isdir(d):
-                shutil.rmtree(d)
-            run_command(["cp", "-R", s, d])
-        else:
-            run_command(["cp", s, d])
-
-    logger.info(f"Copied application files from {DASHBOARD_APP_SRC_DIR} to {deploy_path}")
-
-    run_command(["chown", "-R", f"{service_user}:{service_user}", deploy_path])
+    deploy_abs_path = os.path.abspath(deploy_path)
+    if os.path.abspath(DASHBOARD_APP_SRC_DIR) == deploy_abs_path:
+        logger.info(f"Skipping copy of {DASHBOARD_APP_SRC_DIR} into itself.")
+    else:
+        # Avoid copying the deployment directory into itself if deploy_path is inside DASHBOARD_APP_SRC_DIR
+        def ignore_deploy_path(directory, names):
+            return [name for name in names if os.path.abspath(os.path.join(directory, name)) == deploy_abs_path]
+
+        shutil.copytree(
+            DASHBOARD_APP_SRC_DIR,
+            deploy_path,
+            dirs_exist_ok=True,
+            copy_function=_fast_copy,
+            ignore=ignore_deploy_path,
+        )
+        logger.info(f"Copied application files from {DASHBOARD_APP_SRC_DIR} to {deploy_path}")
+
+    _chown_r(deploy_path, uid, gid)
     logger.info(f"Set ownership of {deploy_path} to {service_user}")
 
     start_script_path = os.path.join(deploy_path, "start_main_app.sh")
     if os.path.exists(start_script_path):
-        run_command(["chmod", "+x", start_script_path])
+        os.chmod(start_script_path, os.stat(start_script_path).st_mode | 0o111)
         logger.info(f"Made {start_script_path} executable.")
 
-def setup_virtual_environment(deploy_path, service_user, python_executable="python3"):
+def get_pip_version(pip_executable, service_user):
+    """Returns the (major, minor) version of a pip executable, or None if it cannot be determined."""
+    result = run_command(["sudo", "-u", service_user, pip_executable, "--version"], capture_output=True, check=False, verbose=False)
+    match = re.match(r"pip (\d+)\.(\d+)", result.stdout or "")
+    if result.returncode != 0 or not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+def _python_version(python_executable):
+    """Returns the 'major.minor' version of an interpreter, or None if it cannot be run."""
+    try:
+        result = run_command(
+            [python_executable, "-c", "import sys; print('%d.%d' % sys.version_info[:2])"],
+            capture_output=True, check=False, verbose=False
+        )
+    except FileNotFoundError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def setup_virtual_environment(deploy_path, service_user, uid, gid, python_executable="python3"):
     """Creates a virtual environment and installs Python dependencies."""
     venv_path = os.path.join(deploy_path, "venv")
     logger.info(f"Setting up Python virtual environment at {venv_path} using {python_executable}")
 
-    # Run venv creation as the service_user. The deploy_path is already owned by service_user.
-    run_command(["sudo", "-u", service_user, python_executable, "-m", "venv", venv_path])
+    venv_python = os.path.join(venv_path, "bin/python")
+    if os.path.exists(venv_python) and _python_version(venv_python) == _python_version(python_executable):
+        logger.info(f"Virtual environment at {venv_path} already matches {python_executable}, skipping creation.")
+    else:
+        # Run venv creation as the service_user. The deploy_path is already owned by service_user.
+        run_command(["sudo", "-u", service_user, python_executable, "-m", "venv", venv_path])
 
     pip_executable = os.path.join(venv_path, "bin/pip")
     requirements_file = os.path.join(deploy_path, "requirements.txt")
 
     logger.info("Installing Python dependencies from requirements.txt...")
-    run_command(["sudo", "-u", service_user, pip_executable, "install", "--upgrade", "pip"])
-    run_command(["sudo", "-u", service_user, pip_executable, "install", "-r", requirements_file])
+    uv_executable = _which("uv")
+    if uv_executable:
+        result = run_command(
+            ["sudo", "-u", service_user, uv_executable, "pip", "install", "--python", venv_python, "-r", requirements_file],
+            check=False,
+        )
+        if result.returncode == 0:
+            logger.info("Python dependencies installed.")
+            return
+        logger.warning(f"'uv pip install' failed (exit code {result.returncode}), falling back to pip.")
+
+    pip_version = get_pip_version(pip_executable, service_user)
+    if pip_version is not None and pip_version >= MIN_PIP_VERSION:
+        logger.info(f"pip {pip_version[0]}.{pip_version[1]} is recent enough, skipping pip upgrade.")
+    else:
+        run_command(["sudo", "-u", service_user, pip_executable, "install", "--upgrade", "pip"])
+
+    os.makedirs(PIP_WHEEL_CACHE_DIR, exist_ok=True)
+    os.chown(PIP_WHEEL_CACHE_DIR, uid, gid)
+    run_command([
+        "sudo", "-u", service_user, pip_executable, "install",
+        "--prefer-binary", "--cache-dir", PIP_WHEEL_CACHE_DIR,
+        "-r", requirements_file,
+    ])
     logger.info("Python dependencies installed.")
 
-def setup_systemd_service(deploy_path, service_user):
+def setup_systemd_service(deploy_path, service_user, gid):
     """Creates and enables the systemd service for the dashboard."""
     logger.info("Setting up systemd service for the main dashboard...")
     service_template_path = os.path.join(deploy_path, "systemd_service_template_main.service")
@@ -158,16 +312,31 @@ def setup_systemd_service(deploy_path, service_user):
     with open(service_template_path, "r") as f:
         service_content = f.read()
 
-    service_content = service_content.replace("{{DASHBOARD_USER}}", service_user)
-    service_content = service_content.replace("{{DASHBOARD_DEPLOY_PATH}}", deploy_path)
+    try:
+        service_group = grp.getgrgid(gid).gr_name
+    except KeyError:
+        service_group = str(gid)
+    service_content = render_template(service_content, {
+        "DASHBOARD_USER": service_user,
+        "DASHBOARD_GROUP": service_group,
+        "DASHBOARD_DEPLOY_PATH": deploy_path,
+    })
 
     service_file_path = "/etc/systemd/system/main_dashboard.service"
-    # Writing this file requires root privileges, which we have due to check_sudo().
-    with open(service_file_path, "w") as f:
-        f.write(service_content)
-    logger.info(f"Created systemd service file at {service_file_path}")
+    try:
+        with open(service_file_path, "r") as f:
+            unit_unchanged = f.read() == service_content
+    except OSError:
+        unit_unchanged = False
+    if unit_unchanged:
+        logger.info(f"Systemd service file {service_file_path} is up to date.")
+    else:
+        # Writing this file requires root privileges, which we have due to check_sudo().
+        _write_file_atomic(service_file_path, service_content)
+        logger.info(f"Created systemd service file at {service_file_path}")
 
-    run_command(["systemctl", "daemon-reload"])
+    # 'systemctl enable' reloads the manager configuration itself, so no separate daemon-reload is needed.
+    # Not 'enable --now': it would leave an already running dashboard on the old code.
     run_command(["systemctl", "enable", "main_dashboard.service"])
     run_command(["systemctl", "restart", "main_dashboard.service"])
 
@@ -215,9 +384,10 @@ def main():
         logger.info(f"Starting local deployment of Main Dashboard to {args.deploy_path} for user {actual_service_user}")
 
         check_system_dependencies(args.python_executable) # This will exit if deps are missing
-        setup_dashboard_files(args.deploy_path, actual_service_user)
-        setup_virtual_environment(args.deploy_path, actual_service_user, args.python_executable)
-        setup_systemd_service(args.deploy_path, actual_service_user)
+        service_uid, service_gid = resolve_service_user(actual_service_user) # This will exit if the user is unknown
+        setup_dashboard_files(args.deploy_path, actual_service_user, service_uid, service_gid)
+        setup_virtual_environment(args.deploy_path, actual_service_user, service_uid, service_gid, args.python_executable)
+        setup_systemd_service(args.deploy_path, actual_service_user, service_gid)
 
         logger.info("Main Dashboard local deployment completed successfully!")
         logger.info(f"The dashboard should soon be accessible (default: http://<your_ip>:5000).")
@@ -1,6 +1,14 @@
+import argparse
+import functools
+import hashlib
+import io
 import json
 import os
+import re
 import shlex
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from fabric import Connection, Config
 from fabric.transfer import Transfer
 from getpass import getpass
@@ -17,34 +25,124 @@ HOSTS_CONFIG_FILE = os.path.join(BASE_DIR, "hosts_config.json") # Expects hosts_
 DEFAULT_PYTHON_VERSION = "python3" # Minimum, adjust if needed
 START_EXPORTER_TEMPLATE_NAME = "start_exporter_template.sh" 
 START_EXPORTER_SCRIPT_NAME = "start_exporter.sh" # Final name on remote
+SYSTEMD_TEMPLATE_NAME = "systemd_service_template.service"
+SYSTEMD_UNIT_NAME = "metrics_exporter.service"
+EXPORTER_FILES = ["exporter.py", "requirements.txt"] # Uploaded verbatim from EXPORTER_NODE_DIR
+DEPLOY_BUNDLE_NAME = ".exporter_bundle.tar.gz"
+DEPLOY_MANIFEST_NAME = ".deploy_manifest" # Holds the digest of the last bundle extracted on the host
+MAX_PARALLEL_DEPLOYMENTS = 32
+_TEMPLATE_RE = re.compile(r"\{\{(\w+)\}\}") # {{KEY}} placeholders in the start script and unit templates
 
 
+def render_template(template, mapping):
+    """Substitutes every {{KEY}} placeholder in a single pass; unknown keys raise instead of leaking into the output."""
+    def substitute(match):
+        key = match.group(1)
+        if key not in mapping:
+            raise KeyError(f"Unrendered placeholder {{{{{key}}}}} in template (known keys: {', '.join(sorted(mapping))})")
+        return mapping[key]
+    return _TEMPLATE_RE.sub(substitute, template)
+
 def get_ssh_password(host_details):
     """Prompt for SSH password if not using key-based auth or if key is passphrase protected."""
     return getpass(f"Enter SSH password for {host_details['username']}@{host_details['address']}: ")
 
-def deploy_to_host(host_details, global_ssh_password=None, global_sudo_password=None):
+def get_sudo_password(host_details):
+    """Prompt for the SUDO password of the remote user."""
+    return getpass(f"Enter SUDO password for {host_details['username']}@{host_details['address']}: ")
+
+def collect_host_credentials(host_details, global_ssh_password=None, global_sudo_password=None):
+    """
+    Resolve SSH and SUDO passwords for a host up front, so that parallel
+    deployments never contend on stdin for interactive prompts.
+    """
+    ssh_password = None
+    if not host_details.get("ssh_key_path"):
+        ssh_password = global_ssh_password or get_ssh_password(host_details)
+    sudo_password = global_sudo_password or get_sudo_password(host_details)
+    return ssh_password, sudo_password
+
+@functools.lru_cache(maxsize=None)
+def load_template(template_name):
+    """Reads a template from EXPORTER_NODE_DIR once; every host deployment renders from the cached text."""
+    with open(os.path.join(EXPORTER_NODE_DIR, template_name), "r") as f:
+        return f.read()
+
+def _add_bytes_to_tar(tf, arcname, content, mode=0o644):
+    """Adds an in-memory file to an open tarfile."""
+    info = tarfile.TarInfo(arcname)
+    info.size = len(content)
+    info.mode = mode
+    info.mtime = int(time.time())
+    tf.addfile(info, io.BytesIO(content))
+
+def render_deploy_files(start_script_content, service_content):
+    """Returns the (name, content, mode) entries that make up an exporter deployment."""
+    entries = []
+    for file_name in EXPORTER_FILES:
+        with open(os.path.join(EXPORTER_NODE_DIR, file_name), "rb") as f:
+            entries.append((file_name, f.read(), 0o644))
+    entries.append((START_EXPORTER_SCRIPT_NAME, start_script_content.encode(), 0o755))
+    entries.append((SYSTEMD_UNIT_NAME, service_content.encode(), 0o644))
+    return entries
+
+def build_deploy_bundle(entries):
+    """
+    Packs the deployment entries into one in-memory gzipped tarball, so a
+    deployment needs a single upload.
+
+    Returns the tarball and a SHA-256 digest of its entries (names, modes and
+    contents). The digest is independent of tar/gzip timestamps, so it only
+    changes when what would be deployed changes.
+    """
+    digest = hashlib.sha256()
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for arcname, content, mode in entries:
+            digest.update(f"{arcname}\0{mode:o}\0{len(content)}\0".encode())
+            digest.update(content)
+            _add_bytes_to_tar(tf, arcname, content, mode=mode)
+    buf.seek(0)
+    return buf, digest.hexdigest()
+
+def upload_files_parallel(c, deploy_path, entries):
+    """
+    Fallback for hosts without tar: uploads each entry concurrently.
+    Every thread opens its own SFTP channel on the shared SSH transport, since
+    a single SFTP client must not be used from several threads at once.
+    """
+    def upload(entry):
+        arcname, content, mode = entry
+        remote_path = os.path.join(deploy_path, arcname)
+        sftp = c.client.open_sftp()
+        try:
+            sftp.putfo(io.BytesIO(content), remote_path)
+            sftp.chmod(remote_path, mode)
+        finally:
+            sftp.close()
+
+    with ThreadPoolExecutor(max_workers=len(entries)) as executor:
+        list(executor.map(upload, entries))
+
+def sudo_chain(c, commands, **kwargs):
+    """
+    Runs several commands as root in one SSH round-trip.
+    c.sudo() only elevates the first command of an '&&' chain, so the whole chain runs in one root shell.
+    """
+    return c.sudo(f"sh -c {shlex.quote(' && '.join(commands))}", **kwargs)
+
+def deploy_to_host(host_details, ssh_password=None, sudo_password=None):
     """Deploys the exporter to a single host."""
     logger.info(f"Starting deployment to host: {host_details['name']} ({host_details['address']})")
 
-    connection_kwargs = {}
+    connection_kwargs = {'banner_timeout': 30}
     if host_details.get("ssh_key_path"):
         connection_kwargs['key_filename'] = os.path.expanduser(host_details["ssh_key_path"])
-    elif global_ssh_password:
-        connection_kwargs['password'] = global_ssh_password
-    else:
-        # Prompt for password if no key is provided
-        password = get_ssh_password(host_details)
-        connection_kwargs['password'] = password
-    
+    elif ssh_password:
+        connection_kwargs['password'] = ssh_password
 
     try:
-        if global_sudo_password:
-            sudo_pass = global_sudo_password
-        else:
-            sudo_pass = getpass(f"Enter SUDO password for {host_details['username']}@{host_details['address']}: ")
-            
-        config = Config(overrides={'sudo': {'password': sudo_pass}})
+        config = Config(overrides={'sudo': {'password': sudo_password}})
         c = Connection(
             host_details['address'], 
             user=host_details['username'], 
@@ -65,89 +163,134 @@ def deploy_to_host(host_details, global_ssh_password=None, global_sudo_password=
         quoted_deploy_path = shlex.quote(deploy_path)
         quoted_user = shlex.quote(remote_user)
         quoted_group = shlex.quote(remote_group)
-        c.sudo(f"mkdir -p {quoted_deploy_path}", warn=True)
-        c.sudo(f"chown {quoted_user}:{quoted_group} {quoted_deploy_path}", warn=True)
+        sudo_chain(c, [f"mkdir -p {quoted_deploy_path}", f"chown {quoted_user}:{quoted_group} {quoted_deploy_path}"], warn=True)
 
-        # 2. Upload exporter files
+        # 2. Render templates and upload all exporter files as a single bundle
         logger.info("Uploading exporter files...")
-        files_to_upload = ["exporter.py", "requirements.txt"]
-        for file_name in files_to_upload:
-            local_path = os.path.join(EXPORTER_NODE_DIR, file_name)
-            remote_file_path = os.path.join(deploy_path, file_name)
-            c.put(local_path, remote=remote_file_path)
-        
-        # --- Process and upload start_exporter.sh ---
         start_script_template_path = os.path.join(EXPORTER_NODE_DIR, START_EXPORTER_TEMPLATE_NAME)
         if not os.path.exists(start_script_template_path):
             logger.error(f"Start script template {START_EXPORTER_TEMPLATE_NAME} not found in {EXPORTER_NODE_DIR}")
             return False
-            
-        with open(start_script_template_path, "r") as f:
-            start_script_content = f.read()
-        
-        start_script_content = start_script_content.replace("{{DEPLOY_PATH}}", deploy_path)
-        start_script_content = start_script_content.replace("{{EXPORTER_PORT}}", exporter_port)
-        
-        # Write processed script to a temporary local file
-        temp_start_script_local_path = os.path.join(BASE_DIR, f"temp_{START_EXPORTER_SCRIPT_NAME}")
-        with open(temp_start_script_local_path, "w") as f_local:
-            f_local.write(start_script_content)
-        
-        remote_start_script_path = os.path.join(deploy_path, START_EXPORTER_SCRIPT_NAME)
-        c.put(temp_start_script_local_path, remote=remote_start_script_path)
-        os.remove(temp_start_script_local_path) # Clean up local temp file
-        
-        c.run(f"chmod +x {remote_start_script_path}")
-        logger.info(f"Uploaded and configured {START_EXPORTER_SCRIPT_NAME} to {remote_start_script_path}")
+
+        start_script_content = render_template(load_template(START_EXPORTER_TEMPLATE_NAME), {
+            "DEPLOY_PATH": deploy_path,
+            "EXPORTER_PORT": exporter_port,
+        })
+        service_content = render_template(load_template(SYSTEMD_TEMPLATE_NAME), {
+            "REMOTE_USER": remote_user,
+            "REMOTE_GROUP": remote_group,
+            "DEPLOY_PATH": deploy_path,
+        })
+
+        remote_service_file_path = f"/etc/systemd/system/{SYSTEMD_UNIT_NAME}"
+        deploy_files = render_deploy_files(start_script_content, service_content)
+        bundle, bundle_digest = build_deploy_bundle(deploy_files)
+        quoted_manifest_path = shlex.quote(os.path.join(deploy_path, DEPLOY_MANIFEST_NAME))
+        # The unit file is moved out of the deploy dir on install, so also require it to still be in place
+        manifest = c.run(f"cat {quoted_manifest_path} 2>/dev/null && test -f {remote_service_file_path}", warn=True, hide=True)
+        bundle_changed = not (manifest.ok and manifest.stdout.strip() == bundle_digest)
+        if bundle_changed:
+            remote_bundle_path = os.path.join(deploy_path, DEPLOY_BUNDLE_NAME)
+            quoted_bundle_path = shlex.quote(remote_bundle_path)
+            c.put(bundle, remote=remote_bundle_path)
+            # Drop the old manifest first; the new digest is only recorded once the service is running it
+            extract = c.run(
+                f"rm -f {quoted_manifest_path} && tar -xzf {quoted_bundle_path} -C {quoted_deploy_path} "
+                f"&& rm -f {quoted_bundle_path}",
+                warn=True, hide=True
+            )
+            if extract.return_code == 127: # tar is not installed on the host
+                logger.warning(f"tar not available on {host_details['name']}, uploading files individually.")
+                c.run(f"rm -f {quoted_bundle_path}", warn=True)
+                upload_files_parallel(c, deploy_path, deploy_files)
+            elif extract.failed:
+                raise RuntimeError(f"Extracting the upload bundle failed: {extract.stderr.strip()}")
+            logger.info(f"Uploaded exporter files and {START_EXPORTER_SCRIPT_NAME} to {deploy_path}")
+        else:
+            logger.info(f"Exporter files on {host_details['name']} are up to date, skipping upload.")
 
         # 3. Install dependencies 
         logger.info("Setting up Python environment and installing dependencies...")
         python_executable = host_details.get("python_executable", DEFAULT_PYTHON_VERSION)
         
-        c.sudo("apt-get update -qq", hide=True, warn=True)
-        c.sudo(f"apt-get install -y -qq {python_executable} {python_executable}-venv git", hide=True, warn=True)
+        system_packages = [python_executable, f"{python_executable}-venv", "git"]
+        quoted_packages = " ".join(shlex.quote(pkg) for pkg in system_packages)
+        probe = c.run(
+            f"dpkg-query -W -f='${{Status}}\\n' {quoted_packages} 2>/dev/null | grep -c 'install ok installed'",
+            warn=True, hide=True
+        )
+        if probe.stdout.strip() == str(len(system_packages)):
+            logger.info(f"System packages already present on {host_details['name']}, skipping apt-get.")
+        else:
+            # ';' not '&&': a flaky mirror during update must not skip the install, which usually still succeeds
+            apt_commands = "; ".join([
+                "DEBIAN_FRONTEND=noninteractive apt-get update -qq",
+                f"DEBIAN_FRONTEND=noninteractive apt-get install -y -qq --no-install-recommends {quoted_packages}",
+            ])
+            apt_result = c.sudo(f"sh -c {shlex.quote(apt_commands)}", hide=True, warn=True)
+            if apt_result.failed:
+                raise RuntimeError(f"Installing system packages ({' '.join(system_packages)}) failed: {apt_result.stderr.strip()}")
 
-        c.run(f"{python_executable} -m venv {quoted_deploy_path}/venv")
+        # Only (re)create the venv when it is missing or was built by a different Python version
+        version_probe = shlex.quote("import sys; print('%d.%d' % sys.version_info[:2])")
+        venv_result = c.run(
+            f'[ "$({quoted_deploy_path}/venv/bin/python -c {version_probe} 2>/dev/null)" = "$({python_executable} -c {version_probe})" ] '
+            f'&& echo venv-ok || {python_executable} -m venv {quoted_deploy_path}/venv',
+            hide=True
+        )
+        if venv_result.stdout.strip() == "venv-ok":
+            logger.info(f"Virtual environment on {host_details['name']} is up to date, skipping creation.")
         pip_executable = f"{deploy_path}/venv/bin/pip"
         requirements_file_remote = f"{deploy_path}/requirements.txt"
-        c.run(f"{shlex.quote(pip_executable)} install --upgrade pip", hide=True)
-        c.run(f"{shlex.quote(pip_executable)} install -r {shlex.quote(requirements_file_remote)}", hide=True)
+        # Use uv when the remote user already has it (on PATH or in its default install locations)
+        uv_probe = c.run("command -v uv || command -v ~/.local/bin/uv || command -v ~/.cargo/bin/uv", warn=True, hide=True)
+        uv_executable = uv_probe.stdout.strip().splitlines()[0] if uv_probe.ok and uv_probe.stdout.strip() else None
+        uv_installed = False
+        if uv_executable:
+            logger.info(f"Installing dependencies on {host_details['name']} with uv ({uv_executable})")
+            uv_result = c.run(
+                f"{shlex.quote(uv_executable)} pip install --python {quoted_deploy_path}/venv/bin/python "
+                f"-r {shlex.quote(requirements_file_remote)}",
+                hide=True, warn=True
+            )
+            uv_installed = uv_result.ok
+            if not uv_installed:
+                logger.warning(f"uv install failed on {host_details['name']}, falling back to pip: {uv_result.stderr.strip()}")
+        if not uv_installed:
+            # Environment is set inline: sshd usually rejects client-sent env vars (AcceptEnv)
+            pip_env = "PIP_NO_PYTHON_VERSION_WARNING=1"
+            c.run(f"{pip_env} {shlex.quote(pip_executable)} install --prefer-binary --upgrade pip", hide=True)
+            c.run(f"{pip_env} {shlex.quote(pip_executable)} install --prefer-binary -r {shlex.quote(requirements_file_remote)}", hide=True)
         c.sudo(f"chown -R {quoted_user}:{quoted_group} {quoted_deploy_path}", warn=True)
 
 
-        # 4. Setup systemd service (remains largely the same)
+        # 4. Setup systemd service (unit file was rendered into the upload bundle)
         logger.info("Setting up systemd service...")
-        service_template_path = os.path.join(EXPORTER_NODE_DIR, "systemd_service_template.service")
-        with open(service_template_path, "r") as f:
-            service_content = f.read()
-        
-        service_content = service_content.replace("{{REMOTE_USER}}", remote_user)
-        service_content = service_content.replace("{{REMOTE_GROUP}}", remote_group)
-        service_content = service_content.replace("{{DEPLOY_PATH}}", deploy_path) # This is correct
-        
-        remote_service_file_path = "/etc/systemd/system/metrics_exporter.service"
-        temp_service_file_local_path_systemd = os.path.join(BASE_DIR, "temp_metrics_exporter_local.service")
-        
-        with open(temp_service_file_local_path_systemd, "w") as f_local:
-            f_local.write(service_content)
-        
-        remote_temp_service_file = f"/tmp/metrics_exporter.service" # Standardize temp path
-        c.put(temp_service_file_local_path_systemd, remote=remote_temp_service_file)
-        os.remove(temp_service_file_local_path_systemd)
+        uploaded_service_file = shlex.quote(os.path.join(deploy_path, SYSTEMD_UNIT_NAME))
 
-        c.sudo(f"mv {remote_temp_service_file} {remote_service_file_path}")
-        c.sudo(f"chown root:root {remote_service_file_path}")
-        c.sudo(f"chmod 644 {remote_service_file_path}")
-
-        c.sudo("systemctl daemon-reload")
-        c.sudo("systemctl enable metrics_exporter.service")
-        c.sudo("systemctl restart metrics_exporter.service")
-        
-        result = c.sudo("systemctl is-active metrics_exporter.service", warn=True, hide=True)
-        if result.stdout.strip() == "active":
+        systemd_commands = []
+        if bundle_changed:
+            systemd_commands += [
+                f"mv {uploaded_service_file} {remote_service_file_path}",
+                f"chown root:root {remote_service_file_path}",
+                f"chmod 644 {remote_service_file_path}",
+                "systemctl daemon-reload",
+            ]
+        result = sudo_chain(c, systemd_commands + [
+            f"systemctl enable {SYSTEMD_UNIT_NAME}",
+            f"systemctl restart {SYSTEMD_UNIT_NAME}",
+            f"systemctl is-active {SYSTEMD_UNIT_NAME}",
+        ], warn=True, hide=True)
+        # Only 'systemctl is-active' writes to stdout; no output means an earlier step of the chain failed.
+        service_status = result.stdout.strip()
+        if not service_status:
+            raise RuntimeError(f"Installing the systemd service failed: {result.stderr.strip()}")
+        if service_status == "active":
+            if bundle_changed:
+                c.run(f"echo {bundle_digest} > {quoted_manifest_path}", warn=True)
             logger.info(f"Metrics exporter service is active on {host_details['name']} (Port: {exporter_port}).")
         else:
-            logger.warning(f"Metrics exporter service status on {host_details['name']}: {result.stdout.strip()}")
+            logger.warning(f"Metrics exporter service status on {host_details['name']}: {service_status}")
             logger.warning("Check logs on the remote host: journalctl -u metrics_exporter.service")
 
         logger.info(f"Deployment to {host_details['name']} completed successfully.")
@@ -162,6 +305,15 @@ def deploy_to_host(host_details, global_ssh_password=None, global_sudo_password=
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Deploy the metrics exporter to the hosts listed in hosts_config.json.")
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=None,
+        help=f"Maximum number of hosts to deploy to concurrently. (Default: number of hosts, capped at {MAX_PARALLEL_DEPLOYMENTS})"
+    )
+    args = parser.parse_args()
+
     logger.info("Starting exporter deployment process...")
     
     if not os.path.exists(HOSTS_CONFIG_FILE):
@@ -184,15 +336,24 @@ def main():
         global_ssh_pass = getpass("Enter SSH password for all servers: ")
         global_sudo_pass = getpass("Enter SUDO password for all servers: ")
 
+    # Prompt for any per-host credentials before fanning out to worker threads
+    credentials = [collect_host_credentials(h, global_ssh_pass, global_sudo_pass) for h in hosts]
+
+    max_workers = args.parallelism or min(MAX_PARALLEL_DEPLOYMENTS, len(hosts))
+    logger.info(f"Deploying to {len(hosts)} hosts with up to {max_workers} in parallel...")
+
     successful_deployments = 0
-    for host_details in hosts:
-        logger.info(f"\n--- Deploying to: {host_details.get('name', host_details['address'])} ---")
-        if deploy_to_host(host_details, global_ssh_password=global_ssh_pass, global_sudo_password=global_sudo_pass):
-            successful_deployments += 1
-        else:
-            logger.error(f"Failed to deploy to {host_details.get('name', host_details['address'])}.")
-            # Decide if you want to stop on first failure or continue
-            # continue
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="deploy") as executor:
+        futures = {
+            executor.submit(deploy_to_host, host_details, ssh_password, sudo_password): host_details
+            for host_details, (ssh_password, sudo_password) in zip(hosts, credentials)
+        }
+        for future in as_completed(futures):
+            host_details = futures[future]
+            if future.result():
+                successful_deployments += 1
+            else:
+                logger.error(f"Failed to deploy to {host_details.get('name', host_details['address'])}.")
 
     logger.info(f"\n--- Deployment Summary ---")
     logger.info(f"Successfully deployed to {successful_deployments}/{len(hosts)} hosts.")
@@ -1,15 +1,21 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+import httpx
 import nvitop
+import orjson
 import psutil
 import platform
+import select
 import os
 import pwd
+import functools
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timezone
 import time
 import threading
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -17,90 +23,200 @@ logger = logging.getLogger(__name__)
 
 # Constants
 CPU_MEASUREMENT_INTERVAL_SECONDS = 0.0  # Non-blocking
+CPU_SAMPLE_INTERVAL_SECONDS = 1.0  # Window of the background CPU utilization sampler
 DOCKER_SOCKET_PATH = "/var/run/docker.sock"
 # Docker cache settings
 DOCKER_CACHE_INTERVAL_SECONDS = int(os.environ.get("DOCKER_METRICS_INTERVAL_SECONDS", 60))
+DOCKER_MAX_BACKOFF_SECONDS = max(600, DOCKER_CACHE_INTERVAL_SECONDS)  # Retry ceiling after consecutive docker failures
+DOCKER_API_TIMEOUT_SECONDS = 30.0  # /system/df walks every layer and can be slow on busy hosts
+UTMP_PATH = "/var/run/utmp"  # Session records behind psutil.users()
+USERS_CACHE_TTL_SECONDS = 300.0  # /etc/passwd mtime does not track LDAP/sssd users, so re-read those periodically
+GPU_POWER_LIMIT_TTL_SECONDS = 60.0  # Admins can change it at runtime (nvidia-smi -pl), so it is not cached for good
+DISK_TARGETS_TTL_SECONDS = 60.0  # Mount topology rarely changes; only usage is re-read per scrape
+DISK_USAGE_TIMEOUT_SECONDS = 3.0  # Report a mount as timed out rather than stall the whole scrape on it
+DISK_USAGE_WORKERS = 8  # Upper bound on concurrent statvfs calls
+LOG_THROTTLE_INTERVAL_SECONDS = 60.0  # A failure that repeats every scrape is logged at most once per interval
+_GB = 1.0 / 1024 ** 3  # bytes -> GiB
+_MIB = 1.0 / 1024 ** 2  # bytes -> MiB
+HOSTNAME = platform.node()  # Resolved once; the hostname does not change while the exporter runs
+
+def _dumps(content: Any) -> bytes:
+    # UTC datetimes are formatted natively as e.g. "2024-01-01T12:00:00.123456Z"
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, which encodes the nested metrics payload much faster than stdlib json."""
+
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
 
 app = FastAPI(
     title="System & GPU Metrics Exporter",
     description="Exposes system CPU, RAM, and NVIDIA GPU metrics.",
-    version="1.0.5"
+    version="1.0.5",
+    default_response_class=ORJSONResponse,
 )
 
 # Global variables for caching
-_metrics_cache = None
-_cache_timestamp = 0
-CACHE_TTL_SECONDS = 2.0
+# include_processes -> (time.time() of collection, payload, encoded JSON body); lightweight scrapes get their own entry.
+# The body is encoded once when the entry is stored, so every scrape of it is served as-is.
+_metrics_cache: Dict[bool, Tuple[float, Dict[str, Any], bytes]] = {}
+CACHE_TTL_SECONDS = float(os.environ.get("METRICS_CACHE_TTL_SECONDS", 2.0))  # Freshness window shared by concurrent scrapes
+METRICS_COLLECTION_INTERVAL_SECONDS = CACHE_TTL_SECONDS  # Refresh period of the background collector
+METRICS_STALE_AFTER_SECONDS = 5 * METRICS_COLLECTION_INTERVAL_SECONDS  # Collect on demand if the collector falls this far behind
+_metrics_collector_running = False
 
 # Docker specific cache
 _docker_cache: Dict[str, Any] = {"error": "Loading..."}
 _docker_lock = threading.Lock()
+# Engine API client on the local socket; connects lazily and is only used by the docker collector thread
+_docker_client = httpx.Client(
+    transport=httpx.HTTPTransport(uds=DOCKER_SOCKET_PATH),
+    base_url="http://docker",
+    timeout=DOCKER_API_TIMEOUT_SECONDS,
+)
+
+# Latest CPU utilization from the background sampler (None until its first sample)
+_cpu_percent_sample: Optional[float] = None
+_cpu_sampler_task: Optional["asyncio.Task[None]"] = None
+
+async def _cpu_sampler() -> None:
+    """Samples CPU utilization over fixed windows, so /metrics never measures it inline."""
+    global _cpu_percent_sample
+    psutil.cpu_percent(interval=None)  # Prime the counter; the first call always returns 0.0
+    while True:
+        await asyncio.sleep(CPU_SAMPLE_INTERVAL_SECONDS)
+        try:
+            _cpu_percent_sample = psutil.cpu_percent(interval=None)
+        except Exception as e:
+            logger.warning("Error sampling CPU utilization: %s", e)
+
+# NVIDIA device handles, enumerated once and dropped on NVML errors so the next scrape re-enumerates
+_gpu_devices: Optional[List[Any]] = None
+_gpu_devices_lock = threading.Lock()
+
+def _get_gpu_devices() -> List[Any]:
+    """Returns the cached nvitop devices, enumerating them on first use."""
+    global _gpu_devices
+    with _gpu_devices_lock:
+        if _gpu_devices is None:
+            _gpu_devices = nvitop.Device.all()
+        return _gpu_devices
+
+@functools.lru_cache(maxsize=None)
+def _gpu_static(index: int) -> Tuple[Any, Any, Any, float]:
+    """GPU attributes that do not change at runtime: (name, uuid, memory_total, 1 / memory_total)."""
+    d = _get_gpu_devices()[index]
+    memory_total = d.memory_total()
+    inv_memory_total = 1.0 / memory_total if memory_total not in (None, nvitop.NA) and memory_total > 0 else 0.0
+    return d.name(), d.uuid(), memory_total, inv_memory_total
+
+# index -> (monotonic time read, power limit in mW)
+_gpu_power_limits: Dict[int, Tuple[float, Any]] = {}
+
+def _gpu_power_limit(gpu_device: Any) -> Any:
+    """The device's power limit, re-read at most every GPU_POWER_LIMIT_TTL_SECONDS."""
+    now = time.monotonic()
+    cached = _gpu_power_limits.get(gpu_device.index)
+    if cached is None or now - cached[0] >= GPU_POWER_LIMIT_TTL_SECONDS:
+        cached = (now, gpu_device.power_limit())
+        _gpu_power_limits[gpu_device.index] = cached
+    return cached[1]
+
+def _invalidate_gpu_devices() -> None:
+    """Forgets the cached device handles and their static attributes, e.g. after the driver was reloaded."""
+    global _gpu_devices
+    with _gpu_devices_lock:
+        _gpu_devices = None
+    _gpu_static.cache_clear()
+    _gpu_power_limits.clear()
+
+def _docker_human_size(size: float, precision: int = 3) -> str:
+    """Formats a byte count like the docker CLI does (decimal units, e.g. "1.23GB")."""
+    units = ("B", "kB", "MB", "GB", "TB", "PB")
+    i = 0
+    while size >= 1000 and i < len(units) - 1:
+        size /= 1000.0
+        i += 1
+    return f"{size:.{precision}g}{units[i]}"
+
+def _docker_container_row(c: Dict[str, Any]) -> Dict[str, Any]:
+    """Maps an Engine API container object to the fields of `docker container ls --format json`."""
+    size_rw = c.get("SizeRw") or 0
+    size_root = c.get("SizeRootFs") or 0
+    return {
+        "ID": c.get("Id", "")[:12],
+        "Image": c.get("Image", ""),
+        "Command": c.get("Command", ""),
+        "Names": ",".join(n.lstrip("/") for n in c.get("Names") or []),
+        "State": c.get("State", ""),
+        "Status": c.get("Status", ""),
+        "Size": f"{_docker_human_size(size_rw)} (virtual {_docker_human_size(size_root)})",
+    }
+
+def _docker_image_rows(img: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One row per repo tag, like `docker image ls`; untagged images show as <none>:<none>."""
+    tags = [t for t in img.get("RepoTags") or [] if t != "<none>:<none>"] or ["<none>:<none>"]
+    rows = []
+    for repo_tag in tags:
+        repository, _, tag = repo_tag.rpartition(":")
+        rows.append({
+            "ID": img.get("Id", ""),
+            "Repository": repository,
+            "Tag": tag,
+            "Containers": img.get("Containers", -1),
+            "Size": _docker_human_size(img.get("Size") or 0),
+        })
+    return rows
 
 def get_docker_metrics() -> Dict[str, Any]:
-    """Collects Docker statistics using docker CLI."""
-    # check if docker socket exists first to avoid unnecessary subprocess calls
+    """Collects Docker statistics from the Engine API over the local unix socket."""
+    # check if docker socket exists first to avoid pointless connection attempts
     if not os.path.exists(DOCKER_SOCKET_PATH):
          return {"error": "Docker socket not found"}
 
     try:
-        import subprocess
-        import json
-        
-        # 1. Containers
-        # docker container ls -a --format '{{json .}}'
-        cmd_containers = ["docker", "container", "ls", "-a", "--format", "{{json .}}"]
-        output_containers = subprocess.check_output(cmd_containers, stderr=subprocess.STDOUT).decode('utf-8')
+        # 1. Disk usage: /system/df also lists every container with its sizes, so
+        # the expensive /containers/json?size=1 walk is not needed on top of it
+        df = orjson.loads(_docker_client.get("/system/df").raise_for_status().content)
         containers = []
         running_count = 0
-        
-        for line in output_containers.strip().split('\n'):
-            if line:
-                try:
-                    c = json.loads(line)
-                    containers.append(c)
-                    # Robust check for running status
-                    state = c.get('State', '').lower()
-                    status = c.get('Status', '').lower()
-                    if state == 'running' or status.startswith('up'):
-                        running_count += 1
-                except json.JSONDecodeError:
-                    pass
-        
-        # 2. Images
-        # docker image ls --format '{{json .}}'
-        cmd_images = ["docker", "image", "ls", "--format", "{{json .}}"]
-        output_images = subprocess.check_output(cmd_images, stderr=subprocess.STDOUT).decode('utf-8')
-        images = []
-        for line in output_images.strip().split('\n'):
-             if line:
-                try:
-                    images.append(json.loads(line))
-                except json.JSONDecodeError:
-                    pass
-
-        # 3. Disk Usage Summary (Build Cache etc)
-        # docker system df --format '{{json .}}'
-        cmd_df = ["docker", "system", "df", "--format", "{{json .}}"]
-        output_df = subprocess.check_output(cmd_df, stderr=subprocess.STDOUT).decode('utf-8')
-        # Output is one JSON object per line: Images, Containers, Local Volumes, Build Cache
-        df_summary = {}
-        for line in output_df.strip().split('\n'):
-             if line:
-                try:
-                    data = json.loads(line)
-                    if "Type" in data:
-                        df_summary[data["Type"]] = data
-                except json.JSONDecodeError:
-                    pass
-        
-        # OVERRIDE: Manually inject the accurate running count into the summary
-        # If 'Containers' key missing, create it.
-        if "Containers" not in df_summary:
-            df_summary["Containers"] = {"TotalCount": len(containers), "Running": running_count, "Size": "0B"}
-        else:
-            df_summary["Containers"]["Running"] = running_count
-            df_summary["Containers"]["TotalCount"] = len(containers)
+        for c in sorted(df.get("Containers") or [], key=lambda c: c.get("Created", 0), reverse=True):
+            containers.append(_docker_container_row(c))
+            if c.get("State", "").lower() == "running":
+                running_count += 1
 
+        # 2. Images (top-level only, like `docker image ls`)
+        images = []
+        resp_images = orjson.loads(_docker_client.get("/images/json").raise_for_status().content)
+        for img in sorted(resp_images, key=lambda i: i.get("Created", 0), reverse=True):
+            images.extend(_docker_image_rows(img))
+
+        # 3. Summary in the shape of `docker system df --format json`
+        df_images = df.get("Images") or []
+        volumes = df.get("Volumes") or []
+        build_cache = df.get("BuildCache") or []
+        df_summary = {
+            "Images": {
+                "TotalCount": len(df_images),
+                "Active": sum(1 for i in df_images if (i.get("Containers") or 0) > 0),
+                "Size": _docker_human_size(df.get("LayersSize") or 0),
+            },
+            "Containers": {
+                "TotalCount": len(containers),
+                "Running": running_count,
+                "Size": _docker_human_size(sum(c.get("SizeRw") or 0 for c in df.get("Containers") or [])),
+            },
+            "Local Volumes": {
+                "TotalCount": len(volumes),
+                # UsageData.Size is -1 when the daemon could not compute it
+                "Size": _docker_human_size(sum(max((v.get("UsageData") or {}).get("Size", 0), 0) for v in volumes)),
+            },
+            "Build Cache": {
+                "TotalCount": len(build_cache),
+                "Size": _docker_human_size(sum(b.get("Size") or 0 for b in build_cache if not b.get("Shared"))),
+            },
+        }
 
         return {
             "containers": containers,
@@ -108,11 +224,12 @@ def get_docker_metrics() -> Dict[str, Any]:
             "summary": df_summary
         }
 
-    except FileNotFoundError:
-        return {"error": "docker CLI not found"}
-    except subprocess.CalledProcessError as e:
-        logger.warning("Error running docker command: %s", e.output)
-        return {"error": f"Docker command failed: {e.output.decode('utf-8', errors='ignore')}"}
+    except httpx.HTTPStatusError as e:
+        logger.warning("Docker API returned %s: %s", e.response.status_code, e.response.text)
+        return {"error": f"Docker API request failed: {e.response.status_code} {e.response.text.strip()}"}
+    except httpx.HTTPError as e:
+        logger.warning("Error querying docker API: %s", e)
+        return {"error": f"Docker API request failed: {e}"}
     except Exception as e:
         logger.warning("Error collecting docker metrics: %s", e, exc_info=True)
         return {"error": str(e)}
@@ -121,7 +238,8 @@ def _docker_collector_thread():
     """Background thread to collect Docker metrics periodically."""
     global _docker_cache
     logger.info(f"Starting Docker metrics collector (Interval: {DOCKER_CACHE_INTERVAL_SECONDS}s)")
-    
+    fail_count = 0  # Consecutive failed collections, e.g. on nodes without docker
+
     while True:
         try:
             start_time = time.time()
@@ -132,9 +250,15 @@ def _docker_collector_thread():
             
             elapsed = time.time() - start_time
             logger.debug(f"Docker metrics collected in {elapsed:.2f}s")
-            
+
+            # Back off exponentially while docker is absent or failing, reset on the first success
+            fail_count = min(fail_count + 1, 16) if "error" in data else 0
+            interval = min(DOCKER_MAX_BACKOFF_SECONDS, DOCKER_CACHE_INTERVAL_SECONDS * 2 ** fail_count)
+            if fail_count:
+                logger.debug(f"Docker metrics unavailable ({data['error']}), retrying in {interval}s")
+
             # Sleep remainder of interval
-            sleep_time = max(1.0, DOCKER_CACHE_INTERVAL_SECONDS - elapsed)
+            sleep_time = max(1.0, interval - elapsed)
             time.sleep(sleep_time)
             
         except Exception as e:
@@ -143,13 +267,46 @@ def _docker_collector_thread():
 
 @app.on_event("startup")
 async def startup_event():
+    global _cpu_sampler_task
     # Start the background thread
     t = threading.Thread(target=_docker_collector_thread, daemon=True)
     t.start()
-
-def get_disk_metrics() -> List[Dict[str, Any]]:
-    """Collects disk usage for critical paths and /data-local mounts."""
-    disk_entries: List[Dict[str, Any]] = []
+    _cpu_sampler_task = asyncio.create_task(_cpu_sampler())
+    # Enumerate GPUs once up front; every scrape then only queries the cached handles
+    try:
+        _get_gpu_devices()
+    except Exception as e:
+        logger.warning("Could not enumerate NVIDIA GPUs at startup: %s", e)
+    threading.Thread(target=_metrics_collector_thread, daemon=True).start()
+
+# Resolved disk targets (path -> label), refreshed every DISK_TARGETS_TTL_SECONDS
+_disk_targets_cache: Dict[str, Any] = {"ts": float("-inf"), "targets": {}}
+# Open /proc/self/mountinfo registered with a poll object; None until first use, False where unavailable
+_mountinfo_watch: Any = None
+
+def _mounts_changed() -> bool:
+    """
+    True if a filesystem was mounted or unmounted since the previous call.
+    The kernel flags an open mountinfo fd with POLLPRI on every mount table change (see proc(5)),
+    so this costs one non-blocking poll; the file's mtime does not change and cannot be used.
+    """
+    global _mountinfo_watch
+    if _mountinfo_watch is None:
+        try:
+            f = open("/proc/self/mountinfo", "rb")
+            poller = select.poll()
+            poller.register(f, select.POLLPRI)
+            _mountinfo_watch = (f, poller)
+        except (OSError, AttributeError):  # no procfs, or no select.poll on this platform
+            _mountinfo_watch = False
+        return False
+    if not _mountinfo_watch:
+        return False
+    # The event is consumed by the poll itself, so nothing needs to be read from the file
+    return bool(_mountinfo_watch[1].poll(0))
+
+def _resolve_disk_targets() -> Dict[str, str]:
+    """Enumerates the paths to report: root, docker and the /data-local mounts."""
     targets: Dict[str, str] = {}  # path -> label mapping
 
     # Root is always tracked
@@ -169,17 +326,21 @@ def get_disk_metrics() -> List[Dict[str, Any]]:
             mount = part.mountpoint.rstrip("/") or "/"
             if mount.startswith(data_local_root):
                 data_local_candidates.add(mount)
-    except Exception as e:
-        logger.warning("Error enumerating disk partitions: %s", e, exc_info=True)
+    except (OSError, psutil.Error) as e:
+        logger.warning("Error enumerating disk partitions: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
 
     if os.path.exists(data_local_root):
         try:
-            for entry in os.listdir(data_local_root):
-                candidate_path = os.path.join(data_local_root, entry)
-                if os.path.isdir(candidate_path):
-                    data_local_candidates.add(os.path.realpath(candidate_path).rstrip("/"))
-        except Exception as e:
-            logger.warning("Error listing directories under %s: %s", data_local_root, e, exc_info=True)
+            # scandir's d_type makes is_dir()/is_symlink() free except for symlinks, which still need a stat to follow.
+            # Only symlinks need a full realpath; other entries reuse the root resolved once.
+            data_local_real = os.path.realpath(data_local_root)
+            with os.scandir(data_local_root) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        real = os.path.realpath(entry.path) if entry.is_symlink() else os.path.join(data_local_real, entry.name)
+                        data_local_candidates.add(real.rstrip("/"))
+        except OSError as e:
+            logger.warning("Error listing directories under %s: %s", data_local_root, e, exc_info=logger.isEnabledFor(logging.DEBUG))
 
     # Add data-local paths to targets
     for mount in sorted(data_local_candidates):
@@ -188,51 +349,134 @@ def get_disk_metrics() -> List[Dict[str, Any]]:
         label = f"Data ({mount})" if mount.startswith(data_local_root) else display_name
         targets[normalized] = label
 
-    # Process all unique targets
+    return targets
+
+# statvfs workers; a hung mount pins one, so a path is never resubmitted while its last call is outstanding
+_disk_executor = ThreadPoolExecutor(max_workers=DISK_USAGE_WORKERS, thread_name_prefix="statvfs")
+_disk_pending: Dict[str, Future] = {}  # path -> statvfs call that outlived its scrape (e.g. unresponsive NFS)
+
+# throttle key -> monotonic time of the last record logged for it
+_log_times: Dict[Any, float] = {}
+
+def _log_throttled(key: Any, level: int, msg: str, *args: Any, exc_info: bool = False) -> None:
+    """
+    Logs at most once per LOG_THROTTLE_INTERVAL_SECONDS for each key. Collectors run every couple of
+    seconds, so a persistent failure would otherwise format the same traceback on every scrape.
+    """
+    now = time.monotonic()
+    if now - _log_times.get(key, float("-inf")) < LOG_THROTTLE_INTERVAL_SECONDS:
+        return
+    _log_times[key] = now
+    logger.log(level, msg, *args, exc_info=exc_info)
+
+def _warn_disk_error(path: str, message: str) -> None:
+    """Logs a disk error without a traceback, at most once per LOG_THROTTLE_INTERVAL_SECONDS for each path."""
+    _log_throttled(("disk", path), logging.WARNING, "%s (further errors for %s suppressed for %ds)", message, path, LOG_THROTTLE_INTERVAL_SECONDS)
+
+def _disk_usage_entry(path: str, label: str) -> Dict[str, Any]:
+    """Builds the disk entry for one path; runs on the disk executor since statvfs can block."""
+    if not os.path.exists(path):
+        return {
+            "path": path,
+            "label": label,
+            "error": "Path not found"
+        }
+
+    try:
+        # Same arithmetic as psutil.disk_usage, without its namedtuple/wrapper overhead.
+        # "used" excludes root-reserved blocks and percent is relative to what users can fill.
+        st = os.statvfs(path)
+        total = st.f_blocks * st.f_frsize
+        free = st.f_bavail * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        user_total = used + free
+        total_gb = total * _GB
+        used_gb = used * _GB
+        free_gb = free * _GB
+        percent_used = used / user_total * 100 if user_total else 0.0
+
+        return {
+            "path": path,
+            "label": label,
+            "total_gb": total_gb,
+            "used_gb": used_gb,
+            "free_gb": free_gb,
+            "percent_used": percent_used
+        }
+    except OSError as e:  # statvfs is the only call that can fail here
+        _warn_disk_error(path, f"Could not read disk usage for {path}: {e}")
+        return {
+            "path": path,
+            "label": label,
+            "error": f"Access denied: {type(e).__name__}"
+        }
+
+def get_disk_metrics() -> List[Dict[str, Any]]:
+    """Collects disk usage for critical paths and /data-local mounts."""
+    # Mount changes are picked up immediately; the TTL still catches new /data-local directories
+    now = time.monotonic()
+    if _mounts_changed() or now - _disk_targets_cache["ts"] >= DISK_TARGETS_TTL_SECONDS:
+        _disk_targets_cache.update(ts=now, targets=_resolve_disk_targets())
+    targets = _disk_targets_cache["targets"]
+
+    # Stat all targets concurrently so a slow network mount costs its own latency, not the sum
+    futures: Dict[str, Future] = {}
     for path, label in targets.items():
-        if not os.path.exists(path):
-            disk_entries.append({
-                "path": path,
-                "label": label,
-                "error": "Path not found"
-            })
-            continue
+        pending = _disk_pending.get(path)
+        if pending is not None and not pending.done():
+            continue  # Still stuck from an earlier scrape; do not pile another worker onto it
+        futures[path] = _disk_executor.submit(_disk_usage_entry, path, label)
+    wait(futures.values(), timeout=DISK_USAGE_TIMEOUT_SECONDS)
 
-        try:
-            usage = psutil.disk_usage(path)
-            total_gb = round(usage.total / (1024 ** 3), 2)
-            used_gb = round(usage.used / (1024 ** 3), 2)
-            free_gb = round(usage.free / (1024 ** 3), 2)
-            percent_used = round(usage.percent, 2)
-
-            disk_entries.append({
-                "path": path,
-                "label": label,
-                "total_gb": total_gb,
-                "used_gb": used_gb,
-                "free_gb": free_gb,
-                "percent_used": percent_used
-            })
-        except (PermissionError, OSError) as e:
-            disk_entries.append({
-                "path": path,
-                "label": label,
-                "error": f"Access denied: {type(e).__name__}"
-            })
-        except Exception as e:
-            logger.warning("Error retrieving disk usage for %s: %s", path, e, exc_info=True)
-            disk_entries.append({
-                "path": path,
-                "label": label,
-                "error": f"Could not retrieve disk usage: {str(e)}"
-            })
+    # Process all unique targets, keeping their order
+    disk_entries: List[Dict[str, Any]] = []
+    for path, label in targets.items():
+        future = futures.get(path, _disk_pending.get(path))
+        if future is not None and future.done():
+            _disk_pending.pop(path, None)
+            disk_entries.append(future.result())
+            continue
+        if future is not None:
+            _disk_pending[path] = future
+        _warn_disk_error(path, f"Disk usage for {path} did not return within {DISK_USAGE_TIMEOUT_SECONDS}s")
+        disk_entries.append({
+            "path": path,
+            "label": label,
+            "error": "Timed out"
+        })
 
     return disk_entries
 
+# (utmp st_mtime_ns, session list) of the last psutil.users() read; swapped as one tuple
+_login_users_cache: Tuple[Optional[int], List[Dict[str, Any]]] = (None, [])
+
+def _logged_in_users() -> List[Dict[str, Any]]:
+    """Login sessions from psutil.users(), re-read only when utmp changed (it is rewritten on every login/logout)."""
+    global _login_users_cache
+    try:
+        mtime = os.stat(UTMP_PATH).st_mtime_ns
+    except OSError:  # No utmp on this system; let psutil decide every time
+        mtime = None
+    cached_mtime, cached_users = _login_users_cache
+    if mtime is not None and mtime == cached_mtime:
+        return cached_users
+    users = [
+        {
+            "name": u.name,
+            "terminal": u.terminal or "N/A",
+            "host": u.host or "N/A",
+            "started": u.started
+        } for u in psutil.users()
+    ]
+    _login_users_cache = (mtime, users)
+    return users
+
 def get_system_metrics() -> Dict[str, Any]:
-    """Gathers CPU and System Memory metrics."""
+    """Gathers CPU and System Memory metrics (disks are collected separately by get_disk_metrics)."""
     try:
-        cpu_percent = psutil.cpu_percent(interval=CPU_MEASUREMENT_INTERVAL_SECONDS)
+        cpu_percent = _cpu_percent_sample
+        if cpu_percent is None:  # Sampler not running (yet)
+            cpu_percent = psutil.cpu_percent(interval=CPU_MEASUREMENT_INTERVAL_SECONDS)
         virtual_mem = psutil.virtual_memory()
         load_avg_1 = load_avg_5 = load_avg_15 = None
         try:
@@ -242,26 +486,17 @@ def get_system_metrics() -> Dict[str, Any]:
         cpu_logical_count = psutil.cpu_count(logical=True) or os.cpu_count()
         return {
             "cpu_percent": cpu_percent,
-            "memory_total_gb": round(virtual_mem.total / (1024**3), 2),
-            "memory_used_gb": round(virtual_mem.used / (1024**3), 2),
+            "memory_total_gb": virtual_mem.total * _GB,
+            "memory_used_gb": virtual_mem.used * _GB,
             "memory_percent": virtual_mem.percent,
-            "load_average_1m": round(load_avg_1, 2) if load_avg_1 is not None else None,
-            "load_average_5m": round(load_avg_5, 2) if load_avg_5 is not None else None,
-            "load_average_15m": round(load_avg_15, 2) if load_avg_15 is not None else None,
-            "load_max": cpu_logical_count if cpu_logical_count is not None else None,
-            "load_max": cpu_logical_count if cpu_logical_count is not None else None,
-            "disks": get_disk_metrics(),
-            "users": [
-                {
-                    "name": u.name,
-                    "terminal": u.terminal or "N/A",
-                    "host": u.host or "N/A",
-                    "started": u.started
-                } for u in psutil.users()
-            ],
+            "load_average_1m": load_avg_1,
+            "load_average_5m": load_avg_5,
+            "load_average_15m": load_avg_15,
+            "load_max": cpu_logical_count,
+            "users": _logged_in_users(),
         }
     except Exception as e:
-        logger.error(f"Error getting system metrics: {e}", exc_info=True)
+        _log_throttled(("system", type(e)), logging.ERROR, "Error getting system metrics: %s", e, exc_info=True)
         return {
             "cpu_percent": None,
             "memory_total_gb": None,
@@ -271,132 +506,279 @@ def get_system_metrics() -> Dict[str, Any]:
             "load_average_5m": None,
             "load_average_15m": None,
             "load_max": None,
-            "disks": [],
             "error": f"Could not retrieve system metrics: {str(e)}"
         }
 
-def get_gpu_metrics() -> List[Dict[str, Any]]:
-    """Gathers metrics for all available NVIDIA GPUs."""
+# psutil handles of GPU processes, kept across scrapes so cpu_percent() measures since the previous scrape
+_host_processes: Dict[int, psutil.Process] = {}
+# The background collector and an on-demand scrape can overlap; one process pass at a time owns the handles
+_host_processes_lock = threading.Lock()
+
+def _host_process_info(pid: int, host_info_cache: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """Reads username, command and CPU usage of a host process in one psutil oneshot() pass (memoized per scrape)."""
+    if pid in host_info_cache:
+        return host_info_cache[pid]
+    info: Dict[str, Any] = {"username": 'N/A', "command": 'N/A', "cpu_percent": 0.0}
+    try:
+        proc = _host_processes.get(pid) or psutil.Process(pid)
+        with proc.oneshot():
+            readers = (
+                ("username", proc.username),
+                ("command", lambda: " ".join(proc.cmdline()) or proc.name()),
+                ("cpu_percent", proc.cpu_percent),
+            )
+            for key, read in readers:
+                try:
+                    info[key] = read()
+                except psutil.AccessDenied:
+                    pass
+        _host_processes[pid] = proc
+    except psutil.Error:  # Process exited between the NVML query and the /proc reads
+        pass
+    host_info_cache[pid] = info
+    return info
+
+def get_gpu_metrics(include_processes: bool = True) -> List[Dict[str, Any]]:
+    """Gathers metrics for all available NVIDIA GPUs; processes are left empty unless include_processes."""
+    if not include_processes:
+        return _collect_gpu_metrics(False)
+    # Serialized so overlapping passes neither race on _host_processes nor reset each other's cpu_percent() baselines
+    with _host_processes_lock:
+        return _collect_gpu_metrics(True)
+
+def _collect_gpu_metrics(include_processes: bool) -> List[Dict[str, Any]]:
     gpu_data_list = []
+    host_info_cache: Dict[int, Dict[str, Any]] = {}
     try:
-        devices = nvitop.Device.all()
+        devices = _get_gpu_devices()
         if not devices:
             return [{"message": "No NVIDIA GPUs found or nvitop could not access them."}]
 
         for gpu_device in devices:
+            name, uuid, memory_total, inv_memory_total = _gpu_static(gpu_device.index)
+            power_limit_mw = _gpu_power_limit(gpu_device)
             processes_info = []
             try:
                 # Get the dictionary of GpuProcess objects
-                gpu_process_map = gpu_device.processes()
+                gpu_process_map = gpu_device.processes() if include_processes else {}
                 
                 if gpu_process_map:
-                    # Convert GpuProcess objects to Snapshot objects for consistent data access
-                    process_snapshots = nvitop.GpuProcess.take_snapshots(
-                        gpu_process_map.values(), failsafe=True
-                    )
-
-                    for p_snapshot in process_snapshots:
+                    # Only the few host attributes we report are read, each PID's /proc files opened once
+                    for gpu_process in gpu_process_map.values():
+                        gpu_memory = gpu_process.gpu_memory()
                         processes_info.append({
-                            "pid": p_snapshot.pid,
-                            "username": p_snapshot.username if p_snapshot.username is not None else 'N/A',
-                            "command": p_snapshot.command if p_snapshot.command is not None else 'N/A',
-                            "gpu_memory_used_mib": round(p_snapshot.gpu_memory / (1024**2), 2) 
-                                if p_snapshot.gpu_memory not in (None, nvitop.NA) else 0,
-                            "cpu_percent": p_snapshot.cpu_percent 
-                                if p_snapshot.cpu_percent not in (None, nvitop.NA) else 0.0,
+                            "pid": gpu_process.pid,
+                            **_host_process_info(gpu_process.pid, host_info_cache),
+                            "gpu_memory_used_mib": gpu_memory * _MIB
+                                if gpu_memory not in (None, nvitop.NA) else 0,
                         })
-                else:
-                    logger.info("No processes reported by nvitop for GPU %s", gpu_device.index)
+                elif include_processes:
+                    logger.debug("No processes reported by nvitop for GPU %s", gpu_device.index)
 
-            except Exception as proc_e:
+            except (nvitop.NVMLError, psutil.Error, OSError) as proc_e:
                 logger.warning(
                     "Error retrieving or processing GPU processes for GPU %s: %s",
-                    gpu_device.index, proc_e, exc_info=True
+                    gpu_device.index, proc_e, exc_info=logger.isEnabledFor(logging.DEBUG)
+                )
+                processes_info.append({"error": f"Could not retrieve processes: {str(proc_e)}"})
+            except Exception as proc_e:
+                # A malformed process entry costs this GPU its process list, not every GPU's metrics
+                _log_throttled(
+                    ("gpu_processes", type(proc_e)), logging.ERROR,
+                    "Unexpected error processing GPU processes for GPU %s: %s", gpu_device.index, proc_e, exc_info=True
                 )
                 processes_info.append({"error": f"Could not retrieve processes: {str(proc_e)}"})
             
-            # Get GPU metrics - each call is a separate NVML query
-            power_usage_mw = gpu_device.power_usage()
-            power_limit_mw = gpu_device.power_limit()
-
-            power_usage_watts = round(power_usage_mw / 1000.0, 2) if power_usage_mw not in (None, nvitop.NA) else None
-            power_limit_watts = round(power_limit_mw / 1000.0, 2) if power_limit_mw not in (None, nvitop.NA) else None
-            
+            # Read only the dynamic fields; oneshot() lets NVML queries that return several
+            # values (memory info, utilization rates) be issued once per GPU
+            with gpu_device.oneshot():
+                power_usage_mw = gpu_device.power_usage()
+                utilization = gpu_device.utilization_rates()
+                memory_used = gpu_device.memory_used()
+                temperature = gpu_device.temperature()
+                fan_speed = gpu_device.fan_speed()
+
+            power_usage_watts = power_usage_mw * 1e-3 if power_usage_mw not in (None, nvitop.NA) else None
+            power_limit_watts = power_limit_mw * 1e-3 if power_limit_mw not in (None, nvitop.NA) else None
             utilization_gpu = None
-            if gpu_device.utilization_rates() is not None:
-                utilization_gpu = gpu_device.utilization_rates().gpu
+            if utilization is not None and utilization.gpu is not nvitop.NA:
+                utilization_gpu = utilization.gpu
 
             gpu_data_list.append({
                 "id": gpu_device.index,
-                "name": gpu_device.name(),
-                "uuid": gpu_device.uuid(),
+                "name": name,
+                "uuid": uuid,
                 "utilization_gpu_percent": utilization_gpu,
-                "memory_total_mib": round(gpu_device.memory_total() / (1024**2), 2),
-                "memory_used_mib": round(gpu_device.memory_used() / (1024**2), 2),
-                "memory_percent": (gpu_device.memory_used() / gpu_device.memory_total()) * 100 
-                    if gpu_device.memory_total() > 0 else 0,
-                "temperature_celsius": gpu_device.temperature(),
+                "memory_total_mib": memory_total * _MIB,
+                "memory_used_mib": memory_used * _MIB,
+                "memory_percent": memory_used * inv_memory_total * 100,
+                "temperature_celsius": temperature,
                 "power_usage_watts": power_usage_watts,
                 "power_limit_watts": power_limit_watts,
-                "fan_speed_percent": gpu_device.fan_speed(),
+                "fan_speed_percent": fan_speed,
                 "processes": processes_info,
             })
     except nvitop.NVMLError as e:
-        logger.error("NVML Error (NVIDIA drivers/libs issue?): %s", e, exc_info=True)
+        _log_throttled(("gpu", type(e)), logging.ERROR, "NVML Error (NVIDIA drivers/libs issue?): %s", e, exc_info=True)
+        _invalidate_gpu_devices()
         return [{"error": f"NVIDIA driver/library issue: {str(e)}"}]
     except Exception as e:
-        logger.error("Error getting GPU metrics: %s", e, exc_info=True)
+        _log_throttled(("gpu", type(e)), logging.ERROR, "Error getting GPU metrics: %s", e, exc_info=True)
         return [{"error": f"Could not retrieve GPU metrics: {str(e)}"}]
+    # Forget handles of processes that no longer use a GPU
+    if include_processes:
+        for pid in _host_processes.keys() - host_info_cache.keys():
+            _host_processes.pop(pid, None)
     return gpu_data_list
 
 
+# Last /users listing, reused until /etc/passwd changes or the TTL expires
+_users_cache: Dict[str, Any] = {"mtime": None, "ts": float("-inf"), "users": []}
+_users_lock = threading.Lock()
+
+def _list_users() -> List[Dict[str, Any]]:
+    """Lists login users (UID >= 1000 or root), re-reading the NSS database only when it may have changed."""
+    try:
+        mtime = os.stat("/etc/passwd").st_mtime_ns
+    except OSError:
+        mtime = None
+    now = time.monotonic()
+    with _users_lock:
+        if mtime is not None and mtime == _users_cache["mtime"] and now - _users_cache["ts"] < USERS_CACHE_TTL_SECONDS:
+            return _users_cache["users"]
+        # getpwall also enumerates sssd/LDAP users, which can take a network round-trip per call
+        users = [
+            {
+                "username": p.pw_name,
+                "uid": p.pw_uid,
+                "gid": p.pw_gid
+            }
+            for p in pwd.getpwall()
+            if p.pw_uid >= 1000 or p.pw_uid == 0
+        ]
+        _users_cache.update(mtime=mtime, ts=now, users=users)
+        return users
+
 @app.get("/users", response_model=Dict[str, List[Dict[str, Any]]])
-async def get_users():
+def get_users():
     """Returns a list of users (UID >= 1000 or root)."""
+    # Sync handler: FastAPI runs it in its threadpool, so a slow NSS lookup does not block the event loop
     try:
-        users = []
-        for p in pwd.getpwall():
-            if p.pw_uid >= 1000 or p.pw_uid == 0:
-                users.append({
-                    "username": p.pw_name,
-                    "uid": p.pw_uid,
-                    "gid": p.pw_gid
-                })
-        return {"users": users}
+        return {"users": _list_users()}
     except Exception as e:
         logger.error(f"Error getting system users: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@app.get("/metrics", response_model=Optional[Dict[str, Any]])
-async def read_metrics():
-    global _metrics_cache, _cache_timestamp
-    
-    now = time.time()
-    if _metrics_cache and (now - _cache_timestamp) < CACHE_TTL_SECONDS:
-        logger.debug("Serving cached metrics")
-        return _metrics_cache
+# Collections currently running for a stale cache entry; concurrent scrapes await them instead of starting their own
+_metrics_inflight: Dict[bool, "asyncio.Task[Tuple[float, Dict[str, Any], bytes]]"] = {}
 
+_collector_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="collector")
+
+def collect_metrics_payload(include_processes: bool = True) -> Dict[str, Any]:
+    """Runs the system, disk and GPU collectors side by side and assembles the /metrics payload."""
+    # The collectors block on psutil/statvfs/NVML, so run them concurrently in worker threads
+    system_future = _collector_executor.submit(get_system_metrics)
+    disk_future = _collector_executor.submit(get_disk_metrics)
+    gpu_future = _collector_executor.submit(get_gpu_metrics, include_processes)
     try:
-        hostname = platform.node()
-        system_info = get_system_metrics()
-        gpu_info = get_gpu_metrics()
-        
-        # Use simple global caching for Docker to prevent blocking
-        with _docker_lock:
-             docker_info = _docker_cache
-
-        result = {
-            "hostname": hostname,
-            "timestamp_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-            "system": system_info,
-            "gpus": gpu_info,
-            "docker": docker_info,
-        }
-        
-        _metrics_cache = result
-        _cache_timestamp = now
-        return result
+        disks = disk_future.result()
+    except Exception as e:
+        # The system and GPU collectors catch their own errors; a disk failure must not drop their data either
+        _log_throttled(("disks", type(e)), logging.ERROR, "Error getting disk metrics: %s", e, exc_info=True)
+        disks = []
+    system_info = {**system_future.result(), "disks": disks}
+
+    # Use simple global caching for Docker to prevent blocking
+    with _docker_lock:
+         docker_info = _docker_cache
+
+    return {
+        "hostname": HOSTNAME,
+        "timestamp_utc": datetime.now(timezone.utc),  # Formatted by orjson when the response is rendered
+        "system": system_info,
+        "gpus": gpu_future.result(),
+        "docker": docker_info,
+    }
+
+def _metrics_collector_thread():
+    """Background thread refreshing the full metrics payload, so /metrics only reads the latest snapshot."""
+    global _metrics_collector_running
+    logger.info(f"Starting metrics collector (Interval: {METRICS_COLLECTION_INTERVAL_SECONDS}s)")
+    _metrics_collector_running = True
+
+    while True:
+        start_time = time.monotonic()
+        try:
+            _cache_metrics(True, collect_metrics_payload())
+        except Exception as e:
+            logger.error(f"Error in metrics collector thread: {e}", exc_info=True)
+        time.sleep(max(0.0, METRICS_COLLECTION_INTERVAL_SECONDS - (time.monotonic() - start_time)))
+
+def _cache_metrics(include_processes: bool, payload: Dict[str, Any], collected_at: Optional[float] = None) -> Tuple[float, Dict[str, Any], bytes]:
+    """Encodes a payload and stores it as the cache entry for its variant."""
+    entry = (time.time() if collected_at is None else collected_at, payload, _dumps(payload))
+    _metrics_cache[include_processes] = entry  # Single reference swap; readers never see partial data
+    return entry
+
+async def _collect_metrics(include_processes: bool = True) -> Tuple[float, Dict[str, Any], bytes]:
+    """Runs one collection on demand and stores the result in the metrics cache."""
+    # Collect and encode in one worker thread hop; waiters coalesced on this task all share the bytes
+    return await asyncio.to_thread(lambda: _cache_metrics(include_processes, collect_metrics_payload(include_processes)))
+
+def _without_processes(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Shallow copy of a payload with the per-GPU process lists emptied."""
+    gpus = [{**gpu, "processes": []} if "processes" in gpu else gpu for gpu in payload.get("gpus", [])]
+    return {**payload, "gpus": gpus}
+
+def _clear_metrics_inflight(include_processes: bool, task: "asyncio.Task[Tuple[float, Dict[str, Any], bytes]]") -> None:
+    if _metrics_inflight.get(include_processes) is task:
+        del _metrics_inflight[include_processes]
+
+def _metrics_response(body: bytes, age: float) -> Response:
+    """
+    Wraps a pre-encoded payload in a response whose Cache-Control tells rapid pollers how long it stays fresh.
+    Returned as a raw Response so FastAPI neither validates nor re-encodes the payload.
+    """
+    max_age = max(0, int(METRICS_COLLECTION_INTERVAL_SECONDS - age))
+    return Response(body, media_type="application/json", headers={"Cache-Control": f"max-age={max_age}"})
+
+@app.get("/metrics")
+async def read_metrics(processes: bool = True):
+    """
+    Returns the host metrics. Pass processes=false to skip the per-process
+    GPU enumeration (the most expensive part) when only aggregates are needed.
+    """
+    if _metrics_collector_running:
+        # Serve the collector's latest snapshot; stripping the process lists is cheaper than collecting again
+        snapshot = _metrics_cache.get(True)
+        if snapshot:
+            age = time.time() - snapshot[0]
+            if age < METRICS_STALE_AFTER_SECONDS:
+                if not processes:
+                    # Strip and encode once per snapshot, keyed by its collection time
+                    stripped = _metrics_cache.get(False)
+                    if stripped is None or stripped[0] != snapshot[0]:
+                        stripped = _cache_metrics(False, _without_processes(snapshot[1]), snapshot[0])
+                    snapshot = stripped
+                return _metrics_response(snapshot[2], age)
+
+    cached = _metrics_cache.get(processes)
+    if cached:
+        age = time.time() - cached[0]
+        if age < CACHE_TTL_SECONDS:
+            logger.debug("Serving cached metrics")
+            return _metrics_response(cached[2], age)
+
+    try:
+        task = _metrics_inflight.get(processes)
+        if task is None:
+            task = asyncio.ensure_future(_collect_metrics(processes))
+            _metrics_inflight[processes] = task
+            task.add_done_callback(functools.partial(_clear_metrics_inflight, processes))
+        # shield: a scraper disconnecting must not cancel the collection others are waiting for
+        entry = await asyncio.shield(task)
+        return _metrics_response(entry[2], 0.0)
     except Exception as e:
         logger.error(f"Critical error in /metrics endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -409,4 +791,4 @@ async def health_check():
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting exporter with Uvicorn for local testing on http://localhost:8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
\ No newline at end of file
@@ -21,4 +21,9 @@ HOST="0.0.0.0" # Listen on all interfaces
 
 echo "Starting System & GPU Metrics Exporter on $HOST:$EXPORTER_PORT at $(date)"
 
-exec "$UVICORN_EXEC" "$APP_MODULE" --host "$HOST" --port "$EXPORTER_PORT"
\ No newline at end of file
+# uvloop and httptools ship with uvicorn[standard]; pin them so a broken install fails loudly
+# instead of silently falling back to the pure-Python asyncio loop and h11 parser.
+# Keep idle connections longer than the dashboard's refresh interval (and its 60s client-side expiry)
+# so each poll reuses its connection instead of reconnecting.
+exec "$UVICORN_EXEC" "$APP_MODULE" --host "$HOST" --port "$EXPORTER_PORT" --loop uvloop --http httptools \
+    --timeout-keep-alive 75
\ No newline at end of file
@@ -1,18 +1,25 @@
 import atexit
 import asyncio
-import copy
+import concurrent.futures
+import heapq
 import httpx
 import json
 import logging
 import math
+import orjson
 import os
-import queue # Added generic import
 import threading
 import time
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from flask import Flask, jsonify, render_template, request, has_request_context, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import uvloop  # Optional (not available on Windows); only the shared background loop uses it
+except ImportError:
+    uvloop = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,7 +33,30 @@ am = AlertManager()
 am.register_check(disk_usage_check)
 am.register_check(root_process_check)
 
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS  # Accept int keys like the stdlib encoder does
+
+def json_bytes(obj: Any) -> bytes:
+    """Encodes obj with orjson, falling back to Flask's default hook for types orjson does not know."""
+    return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS)
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson; jsonify of the full host cache is the dashboard's hottest path."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return json_bytes(obj).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        body = json_bytes(obj)
+        return self._app.response_class(body, mimetype="application/json")
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 @app.route('/api/notifications/stream')
 def notification_stream():
@@ -39,17 +69,22 @@ def notification_stream():
     
     def generate():
         q = nm.subscribe(remote_user)
+        reported_dropped = 0
         try:
             # Send initial ping or connection established message
             yield "event: connected\ndata: {}\n\n"
             while True:
-                try:
-                    # Blocking get with timeout to allow pings
-                    msg = q.get(timeout=15.0)
-                    yield f"event: notification\ndata: {json.dumps(msg)}\n\n"
-                except queue.Empty:
+                # Blocking wait with timeout to allow pings
+                messages = q.wait(timeout=15.0)
+                dropped = q.dropped
+                if dropped != reported_dropped:
+                    yield f"event: dropped\ndata: {orjson.dumps({'count': dropped - reported_dropped}).decode()}\n\n"
+                    reported_dropped = dropped
+                if not messages:
                     # Send keep-alive comment
                     yield ": keepalive\n\n"
+                for msg in messages:
+                    yield f"event: notification\ndata: {msg.json()}\n\n"
         except GeneratorExit:
             nm.unsubscribe(remote_user, q)
         except Exception as e:
@@ -87,6 +122,9 @@ MONITORED_HOSTS = []
 CACHE_REFRESH_SECONDS = float(os.getenv("CACHE_REFRESH_SECONDS", "10"))
 CACHE_STALE_AFTER_SECONDS = float(os.getenv("CACHE_STALE_AFTER_SECONDS", "30"))
 USERS_CACHE_TTL = float(os.getenv("USERS_CACHE_TTL_SECONDS", "1800")) # 30 minutes
+FETCH_CONCURRENCY = max(1, int(os.getenv("FETCH_CONCURRENCY", "32")))  # Max exporters queried at once
+FETCH_ALL_TIMEOUT_SECONDS = float(os.getenv("FETCH_ALL_TIMEOUT_SECONDS", "12"))  # Budget for one full fan-out
+HOST_PUBLISH_COALESCE_SECONDS = 0.1  # Hosts answering within this window are published as one snapshot
 
 # --- Global State ---
 _users_cache = {
@@ -95,6 +133,30 @@ _users_cache = {
 }
 _users_cache_lock = threading.Lock()
 
+# Pooled client shared by all exporter requests so keep-alive connections survive between refreshes.
+# Created on first use and only used from coroutines running on async_loop.
+EXPORTER_TIMEOUT = httpx.Timeout(10.0, connect=2.0)  # Fail fast on unreachable hosts, allow slow scrapes
+# One idle connection per exporter survives between refreshes; the fan-out semaphore bounds concurrency.
+# keepalive_expiry must exceed the refresh interval (httpx defaults to 5s) and stay below the
+# exporter's --timeout-keep-alive, so pooled connections are neither dropped early nor closed mid-request.
+EXPORTER_KEEPALIVE_SECONDS = 60.0
+EXPORTER_LIMITS = httpx.Limits(max_connections=None, max_keepalive_connections=None, keepalive_expiry=EXPORTER_KEEPALIVE_SECONDS)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=EXPORTER_TIMEOUT, limits=EXPORTER_LIMITS)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    client, _http_client = _http_client, None
+    if client is not None:
+        await client.aclose()
+
 
 def _get_env_float(name: str, default: float) -> float:
     value = os.getenv(name)
@@ -116,8 +178,29 @@ def utc_iso(dt: Optional[datetime]) -> Optional[str]:
         return None
     return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") of the last formatted timestamp; swapped as one tuple
+_iso_second: Tuple[int, str] = (-1, "")
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as e.g. "2024-01-01T12:00:00.123456Z", without building a datetime."""
+    global _iso_second
+    sec, usec = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_sec, prefix = _iso_second
+    if sec != cached_sec:
+        # Every host entry of a refresh lands in the same second, so this formats about once per fan-out
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _iso_second = (sec, prefix)
+    return f"{prefix}.{usec:06d}Z"
+
+# Bumped on every config (re)load; an in-flight fetch remembers the generation whose host list it read
+_hosts_generation = 0
+
+
 def load_host_config():
-    global MONITORED_HOSTS
+    global MONITORED_HOSTS, _hosts_generation
+    _hosts_generation += 1
     try:
         if os.path.exists(HOST_CONFIG_PATH):
             with open(HOST_CONFIG_PATH, 'r') as f:
@@ -133,60 +216,133 @@ def load_host_config():
 load_host_config()
 
 
+class AsyncLoopThread:
+    """
+    One long-lived event loop in a daemon thread that sync code hands coroutines to.
+    Views and the cache thread share it instead of spinning up a fresh loop per call.
+    """
+
+    def __init__(self, name: str = "AsyncLoop") -> None:
+        self._name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self._name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedules a coroutine on the shared loop without waiting for it."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Runs a coroutine on the shared loop and blocks the calling thread until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        if not thread.is_alive():
+            loop.close()
+
+
+async_loop = AsyncLoopThread()
+
+
+class CacheState(NamedTuple):
+    """One published version of the host cache. Never mutated: writers publish a new instance."""
+    data: List[Dict[str, Any]]
+    data_json: bytes  # data encoded once per refresh; /api/data embeds it as-is
+    last_refresh: Optional[datetime]
+    last_error: Optional[str]
+    last_refresh_iso: Optional[str] = None  # last_refresh pre-formatted for every snapshot()
+    generation: int = 0  # bumped whenever data or last_error changes; the /api/data ETag
+    host_json: Tuple[bytes, ...] = ()  # each entry of data encoded on its own; data_json is these joined
+
+
+class RefreshTiming(NamedTuple):
+    refresh_interval: float
+    stale_after: float
+
+
 class HostMetricsCache:
+    # Readers load self._state / self._timing once and use that consistent version without locking
+    # (a single attribute load is atomic). Writers serialize on self._lock and publish with one store.
     def __init__(
         self,
         refresh_interval: float,
         stale_after: float,
     ) -> None:
         self._lock = threading.Lock()
-        self._fetch_lock = threading.Lock()
-        self._stop_event = threading.Event()
-        self._thread: Optional[threading.Thread] = None
-        self._data: List[Dict[str, Any]] = []
-        self._last_refresh: Optional[datetime] = None
-        self._last_error: Optional[str] = None
-        self._refresh_interval = max(1.0, refresh_interval)
-        self._base_stale_after = max(self._refresh_interval, stale_after)
-        self.stale_after: float = self._base_stale_after
-
-    # --- Thread management -------------------------------------------------
+        # Refresh loop and stale revalidation both run as tasks on async_loop; no helper threads
+        self._task: Optional[concurrent.futures.Future] = None
+        self._revalidation: Optional[concurrent.futures.Future] = None
+        self._inflight: Optional["asyncio.Future[None]"] = None
+        self._inflight_generation = 0  # _hosts_generation the running fetch read its hosts under
+        self._queued: Optional["asyncio.Future[None]"] = None  # follow-up fetch waiting for _inflight to finish
+        # Host entries finished during a fan-out but not yet published: index -> (entry, encoded entry)
+        self._pending_hosts: Dict[int, Tuple[Dict[str, Any], bytes]] = {}
+        self._publish_handle: Optional[asyncio.TimerHandle] = None
+        self._last_refresh_started = float("-inf")  # monotonic start of the latest fetch, whoever triggered it
+        self._state = CacheState(data=[], data_json=b"[]", last_refresh=None, last_error=None)
+        # Keeps ETags from a previous process from matching the restarted generation counter
+        self._etag_prefix = format(time.time_ns(), "x")
+        refresh_interval = max(1.0, refresh_interval)
+        self._base_stale_after = max(refresh_interval, stale_after)
+        self._timing = RefreshTiming(refresh_interval, self._base_stale_after)
+
+    # --- Task management ---------------------------------------------------
     def start(self) -> None:
-        if self._thread and self._thread.is_alive():
+        if self._task and not self._task.done():
             return
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._run_loop, name="HostMetricsCache", daemon=True)
-        self._thread.start()
+        self._task = async_loop.submit(self._run_loop())
 
     def stop(self) -> None:
-        self._stop_event.set()
-        if self._thread and self._thread.is_alive():
-            self._thread.join(timeout=5)
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            task.result(timeout=5)
+        except (concurrent.futures.CancelledError, concurrent.futures.TimeoutError):
+            pass
 
     # --- Cache access ------------------------------------------------------
     def snapshot(self) -> Dict[str, Any]:
-        with self._lock:
-            data_copy = copy.deepcopy(self._data)
-            last_refresh = self._last_refresh
-            last_error = self._last_error
-            refresh_interval = self._refresh_interval
+        # "data" is shared with other readers rather than copied and must be treated as read-only
+        state = self._state
 
         stale_seconds: Optional[float] = None
-        if last_refresh:
-            stale_seconds = max(0.0, (utc_now() - last_refresh).total_seconds())
+        if state.last_refresh:
+            stale_seconds = max(0.0, (utc_now() - state.last_refresh).total_seconds())
 
         return {
-            "data": data_copy,
-            "last_refresh_utc": utc_iso(last_refresh),
+            "data": state.data,
+            "data_json": state.data_json,
+            "last_refresh_utc": state.last_refresh_iso,
             "stale_for_seconds": stale_seconds,
-            "error": last_error,
-            "refresh_interval_seconds": refresh_interval,
+            "error": state.last_error,
+            "refresh_interval_seconds": self._timing.refresh_interval,
+            "etag": f"{self._etag_prefix}-{state.generation}",
         }
 
     def get_data(self, force_refresh: bool = False) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        if force_refresh or self._is_stale():
+        if force_refresh or self._state.last_refresh is None:
             logger.info("Triggering synchronous cache refresh (force=%s)", force_refresh)
-            self._refresh_once()
+            self._refresh_once(fresh=force_refresh)
+        elif self._is_stale():
+            # Stale-while-revalidate: answer from the old snapshot instead of blocking on every exporter
+            self._revalidate_in_background()
 
         snapshot_metadata = self.snapshot()
         return snapshot_metadata["data"], snapshot_metadata
@@ -194,89 +350,192 @@ class HostMetricsCache:
     # --- Internal helpers --------------------------------------------------
     @property
     def refresh_interval(self) -> float:
-        with self._lock:
-            return self._refresh_interval
+        return self._timing.refresh_interval
+
+    @property
+    def stale_after(self) -> float:
+        return self._timing.stale_after
 
     def set_refresh_interval(self, seconds: float) -> bool:
         seconds = max(1.0, float(seconds))
+        # Called on every /api/data request with an unchanged value; check the published timing before locking
+        if math.isclose(self._timing.refresh_interval, seconds, rel_tol=0.05, abs_tol=0.25):
+            return False
         with self._lock:
-            if math.isclose(self._refresh_interval, seconds, rel_tol=0.05, abs_tol=0.25):
+            if math.isclose(self._timing.refresh_interval, seconds, rel_tol=0.05, abs_tol=0.25):
                 return False
-            self._refresh_interval = seconds
-            self.stale_after = max(self._base_stale_after, seconds)
+            self._timing = RefreshTiming(seconds, max(self._base_stale_after, seconds))
             logger.debug("HostMetricsCache refresh interval set to %.2fs (stale_after=%.2fs)", seconds, self.stale_after)
             return True
 
     def _is_stale(self) -> bool:
-        with self._lock:
-            last_refresh = self._last_refresh
-            stale_after = self.stale_after
-        
+        last_refresh = self._state.last_refresh
         if last_refresh is None:
             return True
         age = (utc_now() - last_refresh).total_seconds()
-        return age >= stale_after
+        return age >= self._timing.stale_after
 
-    def _run_loop(self) -> None:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    async def _run_loop(self) -> None:
         logger.info(
             "Starting background metrics cache refresh loop (interval=%ss, stale_after=%ss)",
             self.refresh_interval,
             self.stale_after,
         )
-        
-        # Initialize AlertManager in this thread/process context if needed, 
-        # or just ensure checks are registered. 
-        # (Assuming they are registered globally on import/startup)
-        from notifications import AlertManager
-        am = AlertManager()
-        
         try:
-            while not self._stop_event.is_set():
-                start_time = time.monotonic()
-                try:
-                    with self._fetch_lock:
-                        data = loop.run_until_complete(fetch_all_hosts_data())
-                    self._update_cache(data)
-                    
-                    # Run alert checks
-                    loop.run_until_complete(am.process_data(data))
-                    
-                except Exception as exc:
-                    logger.error("Background refresh failed: %s", exc, exc_info=True)
-                    with self._lock:
-                        self._last_error = str(exc)
-                elapsed = time.monotonic() - start_time
-                interval = self.refresh_interval
-                wait_time = max(1.0, interval - elapsed)
-                logger.info(f"Background refresh completed in {elapsed:.2f}s, next refresh in {wait_time:.2f}s (interval={interval:.2f}s)")
-                if self._stop_event.wait(wait_time):
-                    break
+            while True:
+                # Forced and stale-triggered refreshes push the next tick back instead of fanning out twice
+                if time.monotonic() >= self._next_refresh_due():
+                    start_time = time.monotonic()
+                    try:
+                        await self._refresh()
+                    except Exception as exc:
+                        logger.error("Background refresh failed: %s", exc, exc_info=True)
+                        self._set_error(str(exc))
+                    elapsed = time.monotonic() - start_time
+                    logger.debug(f"Background refresh completed in {elapsed:.2f}s (interval={self.refresh_interval:.2f}s)")
+                await asyncio.sleep(max(1.0, self._next_refresh_due() - time.monotonic()))
         finally:
-            loop.close()
             logger.info("Background metrics cache loop stopped.")
 
-    def _refresh_once(self) -> None:
+    async def _refresh(self, fresh: bool = False) -> None:
+        """
+        Joins the refresh in flight, or starts one; concurrent callers share a single fan-out.
+        A fetch that read its hosts before the latest config reload, or before a fresh=True caller
+        arrived, is not joined: such callers share one follow-up fetch queued behind it instead.
+        """
+        # Only touched from async_loop, so checking and setting these needs no lock
+        task = self._inflight
+        if task is None:
+            task = self._start_fetch()
+        elif fresh or self._inflight_generation != _hosts_generation:
+            if self._queued is None:
+                self._queued = asyncio.ensure_future(self._fetch_after(task))
+            task = self._queued
+        # A cancelled waiter (e.g. the loop on stop) must not cancel the fetch other callers await
+        await asyncio.shield(task)
+
+    def _start_fetch(self) -> "asyncio.Future[None]":
+        task = self._inflight = asyncio.ensure_future(self._fetch_and_publish())
+        self._inflight_generation = _hosts_generation
+        task.add_done_callback(self._clear_inflight)
+        return task
+
+    async def _fetch_after(self, previous: "asyncio.Future[None]") -> None:
+        # The previous fetch's failure is reported to its own waiters
+        await asyncio.wait([previous])
+        self._queued = None
+        await self._start_fetch()
+
+    def _clear_inflight(self, task: "asyncio.Future[None]") -> None:
+        if self._inflight is task:
+            self._inflight = None
+
+    def _next_refresh_due(self) -> float:
+        return self._last_refresh_started + self.refresh_interval
+
+    async def _fetch_and_publish(self) -> None:
+        self._last_refresh_started = time.monotonic()
+        data = await fetch_all_hosts_data(on_host_done=self._publish_host)
+        self._update_cache(data, self._take_pending_hosts())
+        # AlertManager is a singleton; its checks are registered globally on startup
+        await AlertManager().process_data(data)
+
+    def _revalidate_in_background(self) -> None:
+        with self._lock:
+            if self._revalidation and not self._revalidation.done():
+                return
+            self._revalidation = async_loop.submit(self._revalidate())
+        logger.info("Cache is stale; serving last snapshot while refreshing in the background")
+
+    async def _revalidate(self) -> None:
+        try:
+            await self._refresh()
+        except Exception as exc:
+            logger.error("Background revalidation failed: %s", exc, exc_info=True)
+            self._set_error(str(exc))
+
+    def _refresh_once(self, fresh: bool = False) -> None:
         try:
-            with self._fetch_lock:
-                data = asyncio.run(fetch_all_hosts_data())
-            self._update_cache(data)
-            # Run alerts synchronously-ish (asyncio.run) for the refresh_once case
-            from notifications import AlertManager
-            asyncio.run(AlertManager().process_data(data))
+            async_loop.run(self._refresh(fresh=fresh))
         except Exception as exc:
             logger.error("Synchronous cache refresh failed: %s", exc, exc_info=True)
-            with self._lock:
-                self._last_error = str(exc)
+            self._set_error(str(exc))
 
-    def _update_cache(self, data: List[Dict[str, Any]]) -> None:
+    def _update_cache(
+        self,
+        data: List[Dict[str, Any]],
+        pending: Optional[Dict[int, Tuple[Dict[str, Any], bytes]]] = None,
+    ) -> None:
         now = utc_now()
+        # Encode outside the lock; the list is never mutated after this point, so readers can share it.
+        # Entries already published or queued by _publish_host during this refresh keep their encoding.
+        state = self._state
+        pending = pending or {}
+        reusable = len(state.host_json) == len(data) == len(state.data)
+
+        def encoded(i: int, entry: Dict[str, Any]) -> bytes:
+            queued = pending.get(i)
+            if queued is not None and queued[0] is entry:
+                return queued[1]
+            if reusable and state.data[i] is entry:
+                return state.host_json[i]
+            return json_bytes(entry)
+
+        host_json = tuple(encoded(i, entry) for i, entry in enumerate(data))
+        now_iso = utc_iso(now)
+        with self._lock:
+            self._state = CacheState(
+                data=data,
+                data_json=b"[" + b",".join(host_json) + b"]",
+                last_refresh=now,
+                last_error=None,
+                last_refresh_iso=now_iso,
+                generation=self._state.generation + 1,
+                host_json=host_json,
+            )
+
+    def _publish_host(self, index: int, entry: Dict[str, Any]) -> None:
+        """Queues one host's entry to be swapped into the published snapshot shortly after its fetch completes."""
+        # Runs on async_loop, like _flush_hosts and _take_pending_hosts
+        self._pending_hosts[index] = (entry, json_bytes(entry))
+        if self._publish_handle is None:
+            # One rebuild and one ETag change per window, instead of per host
+            self._publish_handle = asyncio.get_running_loop().call_later(HOST_PUBLISH_COALESCE_SECONDS, self._flush_hosts)
+
+    def _take_pending_hosts(self) -> Dict[int, Tuple[Dict[str, Any], bytes]]:
+        if self._publish_handle is not None:
+            self._publish_handle.cancel()
+            self._publish_handle = None
+        pending, self._pending_hosts = self._pending_hosts, {}
+        return pending
+
+    def _flush_hosts(self) -> None:
+        pending = self._take_pending_hosts()
+        with self._lock:
+            state = self._state
+            data = list(state.data)
+            host_json = list(state.host_json)
+            changed = False
+            for index, (entry, entry_json) in pending.items():
+                # Until the first full refresh after a config change, slots do not line up with the fan-out
+                if index >= len(host_json) or data[index].get("name") != entry.get("name"):
+                    continue
+                data[index] = entry
+                host_json[index] = entry_json
+                changed = True
+            if not changed:
+                return
+            self._state = state._replace(
+                data=data,
+                data_json=b"[" + b",".join(host_json) + b"]",
+                generation=state.generation + 1,
+                host_json=tuple(host_json),
+            )
+
+    def _set_error(self, error: str) -> None:
         with self._lock:
-            # Store data as-is, deep copy only happens in snapshot() for safety
-            self._data = data
-            self._last_refresh = now
-            self._last_error = None
+            if self._state.last_error != error:
+                self._state = self._state._replace(last_error=error, generation=self._state.generation + 1)
 
 
 class ClientIntervalTracker:
@@ -290,7 +549,11 @@ class ClientIntervalTracker:
         self._idle_multiplier = max(1.0, idle_multiplier)
         self._min_idle_seconds = max(5.0, min_idle_seconds)
         self._lock = threading.Lock()
-        self._clients: Dict[str, Dict[str, Any]] = {}
+        # client_id -> (interval, monotonic expiry deadline)
+        self._clients: Dict[str, Tuple[float, float]] = {}
+        # (deadline, client_id) min-heap; entries superseded by a later update are skipped when popped
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._min_interval: Optional[float] = None  # None until recomputed after a membership/interval change
 
     def update(self, client_id: str, interval_seconds: float) -> None:
         if not client_id:
@@ -302,38 +565,38 @@ class ClientIntervalTracker:
         except (TypeError, ValueError):
             return
 
-        now = utc_now()
+        deadline = time.monotonic() + max(self._min_idle_seconds, interval * self._idle_multiplier)
         with self._lock:
-            self._clients[client_id] = {
-                "interval": interval,
-                "last_seen": now,
-            }
-
-    def _prune_locked(self, now: datetime) -> None:
-        expired: List[str] = []
-        for client_id, meta in self._clients.items():
-            interval = meta.get("interval", self._fallback_interval)
-            last_seen: datetime = meta.get("last_seen", now)
-            idle_limit = max(self._min_idle_seconds, interval * self._idle_multiplier)
-            if (now - last_seen).total_seconds() > idle_limit:
-                expired.append(client_id)
-        for client_id in expired:
-            self._clients.pop(client_id, None)
+            previous = self._clients.get(client_id)
+            self._clients[client_id] = (interval, deadline)
+            heapq.heappush(self._expiry_heap, (deadline, client_id))
+            if previous is None or previous[0] != interval:
+                self._min_interval = None
+
+    def _prune_locked(self, now: float) -> None:
+        # Amortized O(1): only entries whose deadline passed are popped, each pushed once per update
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            deadline, client_id = heapq.heappop(heap)
+            meta = self._clients.get(client_id)
+            if meta is not None and meta[1] == deadline:
+                del self._clients[client_id]
+                self._min_interval = None
 
     def effective_interval(self) -> float:
-        now = utc_now()
+        now = time.monotonic()
         with self._lock:
             self._prune_locked(now)
             if not self._clients:
                 return self._fallback_interval
-            intervals = {client_id: meta["interval"] for client_id, meta in self._clients.items()}
-            min_interval = min(intervals.values())
-            if min_interval <= 2.0:  # Log if suspiciously fast
-                logger.warning(f"Suspiciously fast client interval detected: {min_interval}s from clients: {intervals}")
-            return min_interval
+            if self._min_interval is None:
+                self._min_interval = min(interval for interval, _ in self._clients.values())
+                if self._min_interval <= 2.0:  # Log if suspiciously fast
+                    logger.warning(f"Suspiciously fast client interval detected: {self._min_interval}s from {len(self._clients)} clients")
+            return self._min_interval
 
     def active_clients(self) -> int:
-        now = utc_now()
+        now = time.monotonic()
         with self._lock:
             self._prune_locked(now)
             return len(self._clients)
@@ -359,6 +622,11 @@ def _start_cache_background() -> None:
 
 def _stop_cache_background() -> None:
     host_cache.stop()
+    try:
+        async_loop.run(close_http_client(), timeout=5)
+    except Exception as exc:
+        logger.warning("Failed to close exporter HTTP client: %s", exc)
+    async_loop.stop()
 
 
 def _ensure_cache_started() -> None:
@@ -379,25 +647,32 @@ else:
     atexit.register(_stop_cache_background)
 
 
-async def fetch_single_host_data(client: httpx.AsyncClient, host_config: dict) -> dict:
+def _unfetched_host_entry(host_config: dict, error: Optional[str] = None) -> dict:
     url = host_config.get("api_url")
     name = host_config.get("name", url)
-    raw_data = {
+    now_iso = utc_now_iso()
+    return {
         "name": name,
         "url": url,
         "hostname": name,
-        "timestamp_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "timestamp_utc": now_iso,
         "system": {"error": "Not fetched"},
         "gpus": [{"error": "Not fetched"}],
-        "error": None,
+        "error": error,
         "status_code": None,
-        "fetch_time_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        "fetch_time_utc": now_iso
     }
+
+
+async def fetch_single_host_data(client: httpx.AsyncClient, host_config: dict) -> dict:
+    url = host_config.get("api_url")
+    name = host_config.get("name", url)
+    raw_data = _unfetched_host_entry(host_config)
     try:
-        response = await client.get(url, timeout=10.0)
+        response = await client.get(url)
         raw_data["status_code"] = response.status_code
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         raw_data.update(data)
         raw_data["name"] = name
         if "error" in data:
@@ -406,8 +681,10 @@ async def fetch_single_host_data(client: httpx.AsyncClient, host_config: dict) -
         if "gpus" in raw_data and isinstance(raw_data["gpus"], list):
             for gpu_info in raw_data["gpus"]:
                 if isinstance(gpu_info, dict) and "processes" in gpu_info and isinstance(gpu_info["processes"], list):
-                    usernames = sorted(list(set(p.get("username", "N/A") for p in gpu_info["processes"] if isinstance(p, dict))))
-                    gpu_info["process_usernames"] = usernames if usernames else ["None"]
+                    procs = gpu_info["processes"]
+                    # dict keys de-duplicate in one pass without an intermediate set and list; idle GPUs skip it
+                    usernames = sorted({p.get("username", "N/A"): None for p in procs if isinstance(p, dict)}) if procs else None
+                    gpu_info["process_usernames"] = usernames or ["None"]
                 elif isinstance(gpu_info, dict):  # Ensure process_usernames key exists
                     gpu_info["process_usernames"] = ["N/A"]
 
@@ -418,7 +695,7 @@ async def fetch_single_host_data(client: httpx.AsyncClient, host_config: dict) -
     except httpx.RequestError as e:
         logger.warning(f"Request error fetching data from {name} ({url}): {type(e).__name__}")
         raw_data["error"] = f"Request Error: {type(e).__name__} (Host unreachable or DNS issue?)"
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.warning(f"JSON decode error from {name} ({url}): {e}")
         raw_data["error"] = "Invalid JSON response from exporter."
     except Exception as e:
@@ -433,14 +710,37 @@ async def fetch_single_host_data(client: httpx.AsyncClient, host_config: dict) -
     return raw_data
 
 
-async def fetch_all_hosts_data() -> list:
+async def fetch_all_hosts_data(on_host_done: Optional[Callable[[int, dict], None]] = None) -> list:
+    """Fetches every host; on_host_done(index, entry) is called as each one answers, before the rest finish."""
     if not MONITORED_HOSTS:
         return []
 
-    async with httpx.AsyncClient() as client:
-        tasks = [fetch_single_host_data(client, host_conf) for host_conf in MONITORED_HOSTS]
-        results = await asyncio.gather(*tasks)
-    return results
+    client = get_http_client()
+    # Per fan-out cap on simultaneous exporter requests/sockets; concurrent refreshes share one fan-out
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch_bounded(index: int, host_conf: dict) -> dict:
+        async with semaphore:
+            entry = await fetch_single_host_data(client, host_conf)
+        if on_host_done is not None:
+            on_host_done(index, entry)
+        return entry
+
+    hosts = list(MONITORED_HOSTS)
+    tasks = [asyncio.ensure_future(fetch_bounded(index, host_conf)) for index, host_conf in enumerate(hosts)]
+    # Overall budget, so hosts queued behind slow ones cannot stretch the refresh indefinitely
+    _, pending = await asyncio.wait(tasks, timeout=FETCH_ALL_TIMEOUT_SECONDS)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.warning(f"{len(pending)} of {len(hosts)} hosts did not answer within {FETCH_ALL_TIMEOUT_SECONDS:g}s")
+
+    # Keep the configured host order
+    return [
+        _unfetched_host_entry(host_conf, f"Request Error: no response within {FETCH_ALL_TIMEOUT_SECONDS:g}s") if task in pending else task.result()
+        for host_conf, task in zip(hosts, tasks)
+    ]
 
 
 async def _fetch_users_from_host(client: httpx.AsyncClient, host_conf: dict) -> List[Dict[str, Any]]:
@@ -450,7 +750,7 @@ async def _fetch_users_from_host(client: httpx.AsyncClient, host_conf: dict) ->
         users_url = f"{base_url}/users"
         response = await client.get(users_url, timeout=3.0) # Slightly tighter timeout for users
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             return data.get("users", [])
     except Exception as e:
         logger.debug(f"Failed to fetch users from {host_conf.get('name')}: {e}")
@@ -472,29 +772,41 @@ async def fetch_users_list() -> List[Dict[str, Any]]:
     if not MONITORED_HOSTS:
         return []
     
-    async with httpx.AsyncClient() as client:
-        # Fetch from all hosts in parallel
-        tasks = [_fetch_users_from_host(client, host_conf) for host_conf in MONITORED_HOSTS]
-        results = await asyncio.gather(*tasks)
-        
-        # Take the first non-empty list of users
-        all_users = []
-        for users in results:
-            if users:
-                all_users = users
-                break
-        
-        if all_users:
-            sorted_users = sorted(all_users, key=lambda x: x.get("username", ""))
-            # Update cache
-            with _users_cache_lock:
-                _users_cache["data"] = sorted_users
-                _users_cache["expiry"] = time.time() + USERS_CACHE_TTL
-            return sorted_users
+    client = get_http_client()
+    # Fetch from all hosts in parallel
+    tasks = [_fetch_users_from_host(client, host_conf) for host_conf in MONITORED_HOSTS]
+    results = await asyncio.gather(*tasks)
+    
+    # Take the first non-empty list of users
+    all_users = []
+    for users in results:
+        if users:
+            all_users = users
+            break
     
+    if all_users:
+        sorted_users = sorted(all_users, key=lambda x: x.get("username", ""))
+        # Update cache
+        with _users_cache_lock:
+            _users_cache["data"] = sorted_users
+            _users_cache["expiry"] = time.time() + USERS_CACHE_TTL
+        return sorted_users
+
     return []
 
 
+TRUTHY_ARG_VALUES = frozenset({"1", "true", "yes"})
+
+
+def _truthy_arg(args, *keys: str) -> bool:
+    """True if any of the query parameters is set to a truthy value; missing ones are skipped."""
+    for key in keys:
+        value = args.get(key)
+        if value and value.lower() in TRUTHY_ARG_VALUES:
+            return True
+    return False
+
+
 def _resolve_client_identifier() -> str:
     forwarded_for = request.headers.get("X-Forwarded-For", "") if has_request_context() else ""
     client_address = forwarded_for.split(",")[0].strip() if forwarded_for else (request.remote_addr if has_request_context() else "")
@@ -549,11 +861,12 @@ def get_all_data_api():
             },
         })
 
-    force_flag = request.args.get("fresh", "").lower() in {"1", "true", "yes"} or request.args.get("force", "").lower() in {"1", "true", "yes"}
+    args = request.args
+    force_flag = _truthy_arg(args, "fresh", "force")
 
-    interval_param = request.args.get("client_interval_seconds")
+    interval_param = args.get("client_interval_seconds")
     if interval_param is None:
-        interval_param = request.args.get("clientIntervalSeconds")
+        interval_param = args.get("clientIntervalSeconds")
 
     client_id = _resolve_client_identifier()
     if interval_param is not None:
@@ -570,21 +883,33 @@ def get_all_data_api():
         )
 
     data, snapshot = host_cache.get_data(force_refresh=force_flag)
-    response = {
-        "data": data,
-        "metadata": {
-            "last_refresh_utc": snapshot.get("last_refresh_utc"),
-            "stale_for_seconds": snapshot.get("stale_for_seconds"),
-            "error": snapshot.get("error"),
-            "hosts_count": len(data),
-            "served_from": "forced" if force_flag else "cache",
-            "cache_refresh_interval_seconds": host_cache.refresh_interval,
-            "client_effective_interval_seconds": effective_interval,
-            "active_client_count": client_interval_tracker.active_clients(),
-        },
+    metadata = {
+        "last_refresh_utc": snapshot.get("last_refresh_utc"),
+        "stale_for_seconds": snapshot.get("stale_for_seconds"),
+        "error": snapshot.get("error"),
+        "hosts_count": len(data),
+        "served_from": "forced" if force_flag else "cache",
+        "cache_refresh_interval_seconds": host_cache.refresh_interval,
+        "client_effective_interval_seconds": effective_interval,
+        "active_client_count": client_interval_tracker.active_clients(),
     }
 
-    return jsonify(response)
+    # Weak ETag: the per-request metadata may differ, but hosts, error and refresh time are the same
+    etag = snapshot.get("etag")
+    if etag and not force_flag and request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        # Splice the host list encoded at refresh time into the response instead of re-serializing it per request
+        data_json = snapshot.get("data_json")
+        if data_json is None:
+            data_json = json_bytes(data)
+        body = b'{"data":%b,"metadata":%b}' % (data_json, json_bytes(metadata))
+        response = app.response_class(body, mimetype="application/json")
+    if etag:
+        response.set_etag(etag, weak=True)
+        # Browsers revalidate on every poll and reuse their copy on 304
+        response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.route('/debug')
@@ -594,9 +919,10 @@ def debug_page():
 
 
 @app.route('/api/users')
-async def get_debug_users():
+def get_debug_users():
     """API endpoint to fetch users from the first available server."""
-    users = await fetch_users_list()
+    # Sync view on the shared loop; an async view would make Flask build a new event loop per request
+    users = async_loop.run(fetch_users_list())
     return jsonify({"users": users})
 
 @app.route('/api/config/reload', methods=['POST'])
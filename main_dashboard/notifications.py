@@ -1,92 +1,188 @@
 import asyncio
+import functools
 import logging
-import queue
+import orjson
 import threading
 import time
-from typing import Dict, List, Optional, Callable, Any
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AbstractSet, Dict, Iterable, List, Optional, Callable, Any, Tuple
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
-def utc_now_timestamp():
-    return time.time()
+utc_now_timestamp = time.time  # Bound directly: no wrapper frame per message
+
+# Guards first construction of the NotificationManager / AlertManager singletons
+_singleton_lock = threading.Lock()
+
+
+LEVEL_SEVERITY = {"info": 0, "warning": 1, "critical": 2}
+
+
+@dataclass(frozen=True)
+class Notification:
+    """One message as delivered to SSE subscribers; orjson serializes it like the old dict."""
+    # Declared by hand (not slots=True) to add _json, a cache that is not a dataclass field
+    __slots__ = ("title", "body", "level", "timestamp", "_json")
+
+    title: str
+    body: str
+    level: str
+    timestamp: float
+
+    def json(self) -> str:
+        """Encoded once and reused by every SSE stream the message is delivered to."""
+        try:
+            return self._json
+        except AttributeError:
+            encoded = orjson.dumps(self).decode()
+            object.__setattr__(self, "_json", encoded)
+            return encoded
+
+ALERT_MIN_REOPEN_SECONDS = 60.0  # An alert that clears and re-fires within this window is not re-notified
+ROOT_PROCESSES_NAMED = 3  # Root processes listed by name in an alert; the rest are summarized as a count
+
+# Per-user messages collected while AlertManager.process_data runs its checks; None outside a cycle
+_alert_batch: ContextVar[Optional[Dict[str, List[Dict[str, str]]]]] = ContextVar("alert_batch", default=None)
+
+
+class SubscriberChannel:
+    """
+    One SSE connection's inbox. deque append/popleft are atomic, so producers only
+    pay for an Event.set() instead of queue.Queue's mutex and condition variable.
+    """
+    __slots__ = ("_messages", "_ready", "dropped")
+
+    MAX_PENDING = 1024  # A stalled tab drops its oldest notifications instead of growing without bound
+    HIGH_WATERMARK = MAX_PENDING * 3 // 4  # Logged when a tab falls this far behind
+
+    def __init__(self) -> None:
+        self._messages: deque = deque(maxlen=self.MAX_PENDING)
+        self._ready = threading.Event()
+        self.dropped = 0  # Messages evicted unread; the SSE stream reports increases to the browser
+
+    def put(self, message: Notification) -> None:
+        pending = len(self._messages)
+        if pending >= self.MAX_PENDING:
+            self.dropped += 1  # The append below evicts the oldest message
+        elif pending == self.HIGH_WATERMARK:
+            logger.warning(f"Notification subscriber is falling behind: {pending} messages pending")
+        self._messages.append(message)
+        self._ready.set()
+
+    def wait(self, timeout: Optional[float] = None) -> List[Notification]:
+        """Blocks until messages arrive or the timeout passes, then returns everything pending (maybe [])."""
+        if not self._messages:
+            self._ready.wait(timeout)
+        # Clear before draining: a put racing with the drain leaves the event set for the next wait
+        self._ready.clear()
+        messages = []
+        while self._messages:
+            messages.append(self._messages.popleft())
+        return messages
+
 
 class NotificationManager:
     _instance = None
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(NotificationManager, cls).__new__(cls)
-            cls._instance.init()
+            with _singleton_lock:
+                if cls._instance is None:
+                    instance = super(NotificationManager, cls).__new__(cls)
+                    instance.init()
+                    # Publish only once initialized, so the unlocked fast path never sees a bare instance
+                    cls._instance = instance
         return cls._instance
 
     def init(self):
-        # Maps user_id -> List[queue.Queue]
-        # A user might have multiple tabs open, so we support multiple queues per user.
+        # Maps user_id -> Tuple[SubscriberChannel, ...]
+        # A user might have multiple tabs open, so we support multiple channels per user.
         # However, typically SSE works one connection per client.
         # But if the same user opens 2 tabs, we want both to get the notif.
-        self._subscribers: Dict[str, List[queue.Queue]] = {}
+        # Copy-on-write: (un)subscribe publish a new dict under _lock; senders read the current one lock-free.
+        self._subscribers: Dict[str, Tuple[SubscriberChannel, ...]] = {}
         self._lock = threading.Lock()
 
-    def subscribe(self, user_id: str) -> queue.Queue:
+    def subscribe(self, user_id: str) -> SubscriberChannel:
         """
-        Subscribe a user to notifications. Returns a queue that will receive messages.
+        Subscribe a user to notifications. Returns a channel that will receive messages.
         """
         logger.info(f"User subscribed to notifications: {user_id}")
-        q = queue.Queue()
+        q = SubscriberChannel()
         with self._lock:
-            if user_id not in self._subscribers:
-                self._subscribers[user_id] = []
-            self._subscribers[user_id].append(q)
+            subscribers = dict(self._subscribers)
+            subscribers[user_id] = subscribers.get(user_id, ()) + (q,)
+            self._subscribers = subscribers
         return q
 
-    def unsubscribe(self, user_id: str, q: queue.Queue):
+    def unsubscribe(self, user_id: str, q: SubscriberChannel):
         with self._lock:
             if user_id in self._subscribers:
-                if q in self._subscribers[user_id]:
-                    self._subscribers[user_id].remove(q)
-                if not self._subscribers[user_id]:
-                    del self._subscribers[user_id]
+                subscribers = dict(self._subscribers)
+                remaining = tuple(existing for existing in subscribers[user_id] if existing is not q)
+                if remaining:
+                    subscribers[user_id] = remaining
+                else:
+                    del subscribers[user_id]
+                self._subscribers = subscribers
         logger.info(f"User unsubscribed from notifications: {user_id}")
 
-    def send_to_user(self, user_id: str, title: str, body: str, level: str = "info"):
+    @staticmethod
+    def _make_message(title: str, body: str, level: str) -> Notification:
+        return Notification(title, body, level, utc_now_timestamp())
+
+    def _enqueue(self, user_id: str, message: Notification):
         """
-        Send a notification to a specific user.
+        Put an already built message on every tab of a user. Messages are never mutated,
+        so one instance is shared by all recipients.
         """
-        message = {
-            "title": title,
-            "body": body,
-            "level": level,
-            "timestamp": utc_now_timestamp()
-        }
-        count = 0
-        with self._lock:
-            queues = self._subscribers.get(user_id, [])
-            for q in queues:
-                q.put(message)
-                count += 1
+        queues = self._subscribers.get(user_id, ())
+        for q in queues:
+            q.put(message)
+        count = len(queues)
         if count > 0:
-            logger.info(f"Sent notification to user {user_id} (active tabs: {count}): {title}")
+            logger.info(f"Sent notification to user {user_id} (active tabs: {count}): {message.title}")
         else:
-            logger.debug(f"User {user_id} is not connected, dropped notification: {title}")
+            logger.debug(f"User {user_id} is not connected, dropped notification: {message.title}")
+
+    def send_to_user(self, user_id: str, title: str, body: str, level: str = "info"):
+        """
+        Send a notification to a specific user.
+        """
+        self._enqueue(user_id, self._make_message(title, body, level))
 
     def broadcast(self, title: str, body: str, level: str = "info"):
         """
         Send a notification to all connected users.
         """
-        message = {
-            "title": title,
-            "body": body,
-            "level": level,
-            "timestamp": utc_now_timestamp()
-        }
-        with self._lock:
-            for user_queues in self._subscribers.values():
-                for q in user_queues:
-                    q.put(message)
+        message = self._make_message(title, body, level)
+        for user_queues in self._subscribers.values():
+            for q in user_queues:
+                q.put(message)
         logger.info(f"Broadcasted notification: {title}")
 
-    async def send_to_server_users(self, server_url: str, title: str, body: str, level: str = "info", user_list: List[str] = None):
+    def send_batch(self, batch: Dict[str, List[Dict[str, str]]]):
+        """
+        Send each user the alerts collected for them in one cycle as a single notification.
+        """
+        # An alert sent alone to several users becomes one shared message
+        built: Dict[int, Notification] = {}
+        for user_id, messages in batch.items():
+            if len(messages) == 1:
+                msg = messages[0]
+                message = built.get(id(msg))
+                if message is None:
+                    message = built[id(msg)] = self._make_message(msg["title"], msg["body"], msg["level"])
+                self._enqueue(user_id, message)
+                continue
+            level = max((msg["level"] for msg in messages), key=lambda lvl: LEVEL_SEVERITY.get(lvl, 0))
+            body = "\n".join(f"{msg['title']}: {msg['body']}" for msg in messages)
+            self.send_to_user(user_id, f"{len(messages)} new alerts", body, level)
+
+    async def send_to_server_users(self, server_url: str, title: str, body: str, level: str = "info", user_list: Optional[Iterable[str]] = None):
         """
         Send notification to users logged into the server.
         
@@ -95,20 +191,30 @@ class NotificationManager:
             title: Notification title
             body: Notification body text
             level: Notification level (info, warning, critical)
-            user_list: List of usernames to notify. Should be extracted from system.users in metrics.
+            user_list: Usernames to notify, e.g. from host_usernames(); a set is used as is.
         """
         if not user_list:
             logger.debug(f"No user_list provided for {server_url}, skipping notification")
             return 0
             
-        target_usernames = set(user_list)
+        target_usernames = user_list if isinstance(user_list, AbstractSet) else set(user_list)
         logger.info(f"Sending notification '{title}' to server {server_url} users: {target_usernames}")
         
+        # During an alert cycle, queue for AlertManager to send as one notification per user
+        batch = _alert_batch.get()
+        # Built once and shared by every recipient
+        if batch is not None:
+            alert = {"title": title, "body": body, "level": level}
+        else:
+            message = self._make_message(title, body, level)
         count_sent = 0
         for username in target_usernames:
-            # Send to user if they're subscribed (connected to dashboard)
-            # If not connected, send_to_user will log a debug message
-            self.send_to_user(username, title, body, level)
+            if batch is not None:
+                batch.setdefault(username, []).append(alert)
+            else:
+                # Send to user if they're subscribed (connected to dashboard)
+                # If not connected, _enqueue will log a debug message
+                self._enqueue(username, message)
             count_sent += 1
             
         return count_sent
@@ -119,20 +225,41 @@ class AlertManager:
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(AlertManager, cls).__new__(cls)
-            cls._instance.init()
+            with _singleton_lock:
+                if cls._instance is None:
+                    instance = super(AlertManager, cls).__new__(cls)
+                    instance.init()
+                    # Publish only once initialized, so the unlocked fast path never sees a bare instance
+                    cls._instance = instance
         return cls._instance
 
     def init(self):
         self.checks = []
-        # Track currently active alerts (edge-triggered)
-        self.active_alerts: set = set()
+        # Split once at registration so process_data does not inspect every check every cycle
+        self._async_checks: Tuple[Callable, ...] = ()
+        self._sync_checks: Tuple[Callable, ...] = ()
+        # Track currently active alerts (edge-triggered); replaced wholesale each cycle, never mutated
+        self.active_alerts: frozenset = frozenset()
         # Track alerts reported in current cycle
         self.current_cycle_alerts: set = set()
+        # alert_key -> time its notification last fired, to suppress alerts flapping across cycles
+        self._last_fired: Dict[str, float] = {}
         self._lock = threading.Lock()
 
     def register_check(self, check_func: Callable[[Any], None]):
         self.checks.append(check_func)
+        if asyncio.iscoroutinefunction(check_func):
+            self._async_checks += (check_func,)
+        else:
+            self._sync_checks += (check_func,)
+
+    @staticmethod
+    def _run_sync_checks(checks: Tuple[Callable, ...], hosts_data: List[Dict[str, Any]]):
+        for check in checks:
+            try:
+                check(hosts_data)
+            except Exception as e:
+                logger.error(f"Error running alert check {getattr(check, '__name__', check)}: {e}", exc_info=True)
 
     async def process_data(self, hosts_data: List[Dict[str, Any]]):
         """
@@ -141,21 +268,33 @@ class AlertManager:
         """
         # Reset current cycle
         with self._lock:
-            self.current_cycle_alerts.clear()
+            self.current_cycle_alerts = set()
         
-        # Run all checks (they will call report_alert)
-        for check in self.checks:
-            try:
-                if asyncio.iscoroutinefunction(check):
-                    await check(hosts_data)
-                else:
-                    check(hosts_data)
-            except Exception as e:
-                logger.error(f"Error running alert check: {e}", exc_info=True)
+        # Run all checks concurrently (they will call report_alert); sync ones share one worker thread
+        # so they cannot stall the shared event loop, and one failing check does not skip the rest
+        async_checks, sync_checks = self._async_checks, self._sync_checks
+        # Tasks and to_thread copy the context, so every check appends to this cycle's batch
+        batch: Dict[str, List[Dict[str, str]]] = {}
+        token = _alert_batch.set(batch)
+        try:
+            pending = [check(hosts_data) for check in async_checks]
+            if sync_checks:
+                pending.append(asyncio.to_thread(self._run_sync_checks, sync_checks, hosts_data))
+            results = await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            _alert_batch.reset(token)
+        # Sync check failures were logged in the worker; their gather slot (last, if any) is None
+        for check, result in zip(async_checks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error running alert check {getattr(check, '__name__', check)}: {result}", exc_info=result)
         
-        # Update active alerts to match current cycle
+        # Update active alerts to match current cycle; one reference store, so readers need no lock
         with self._lock:
-            self.active_alerts = self.current_cycle_alerts.copy()
+            self.active_alerts = frozenset(self.current_cycle_alerts)
+            cutoff = utc_now_timestamp() - ALERT_MIN_REOPEN_SECONDS
+            self._last_fired = {key: fired for key, fired in self._last_fired.items() if fired > cutoff}
+
+        NotificationManager().send_batch(batch)
 
     async def report_alert(self, alert_key: str, notification_callback):
         """
@@ -166,13 +305,25 @@ class AlertManager:
             alert_key: Unique identifier for this alert condition
             notification_callback: Async function to call if this is a new alert
         """
+        # Repeat reports of a key within a cycle can never notify; skip them before taking the lock
+        # (checks and their writes run on one event loop, so the unlocked read is not racing a writer)
+        if alert_key in self.current_cycle_alerts:
+            return
+
+        now = utc_now_timestamp()
         with self._lock:
-            # Add to current cycle
+            # Only the first report of a key in a cycle may notify, even if several checks raise it
+            first_in_cycle = alert_key not in self.current_cycle_alerts
             self.current_cycle_alerts.add(alert_key)
-            
-            # Check if this is a new alert
-            is_new = alert_key not in self.active_alerts
-        
+
+            # Check if this is a new alert (active_alerts is an immutable snapshot)
+            is_new = first_in_cycle and alert_key not in self.active_alerts
+            if is_new and now - self._last_fired.get(alert_key, float("-inf")) < ALERT_MIN_REOPEN_SECONDS:
+                logger.debug(f"Alert {alert_key} re-opened within {ALERT_MIN_REOPEN_SECONDS:g}s, not notifying again")
+                is_new = False
+            if is_new:
+                self._last_fired[alert_key] = now
+
         if is_new:
             logger.info(f"New alert detected: {alert_key}")
             await notification_callback()
@@ -180,6 +331,44 @@ class AlertManager:
 
 # --- Built-in Checks ---
 
+def host_usernames(host: Dict[str, Any]) -> frozenset:
+    """Names of the users logged into a host, read once per host per cycle."""
+    system = host.get("system") or {}
+    return frozenset(u["name"] for u in system.get("users") or () if isinstance(u, dict) and u.get("name"))
+
+
+async def _send_disk_alert(nm: "NotificationManager", server_name: str, url: Optional[str], path: str, percent_val: float, host_users: frozenset):
+    msg = f"Disk usage on {server_name} ({path}) is critical: {percent_val:.1f}%"
+    logger.warning(f"ALERT: {msg}")
+
+    if url:
+        await nm.send_to_server_users(
+            server_url=url,
+            title=f"Critical Disk Usage on {server_name}",
+            body=msg,
+            level="critical",
+            user_list=host_users
+        )
+
+
+async def _send_root_process_alert(nm: "NotificationManager", server_name: str, url: Optional[str], root_procs: List[str], others: int, host_users: frozenset):
+    msg = f"Root user detected on GPU processes: {', '.join(root_procs)}"
+    if others:
+        msg += f" and {others} others..."
+    msg += ". Please relaunch with your own user!"
+
+    logger.warning(f"ALERT: {msg}")
+
+    if url:
+        await nm.send_to_server_users(
+            server_url=url,
+            title=f"Root Process Detected on {server_name}",
+            body=msg,
+            level="warning",
+            user_list=host_users
+        )
+
+
 async def disk_usage_check(hosts_data: List[Dict[str, Any]]):
     """
     Check for critical disk usage using 'disks' list from system metrics.
@@ -193,45 +382,37 @@ async def disk_usage_check(hosts_data: List[Dict[str, Any]]):
     for host in hosts_data:
         system = host.get("system", {})
         disks = system.get("disks", [])
-        
+        if not isinstance(disks, list):
+            continue
+
+        server_name = host.get("name", "Unknown Server")
+        url = host.get("url")
+        # Resolved lazily so healthy hosts never build the user set
+        host_users: Optional[frozenset] = None
+
         # Parse disks list
-        if isinstance(disks, list):
-            for disk in disks:
-                if not isinstance(disk, dict):
+        for disk in disks:
+            if not isinstance(disk, dict):
+                continue
+
+            path = disk.get("path")
+            percent = disk.get("percent_used")
+
+            if path and percent is not None:
+                try:
+                    percent_val = float(percent)
+                except (ValueError, TypeError):
                     continue
-                    
-                path = disk.get("path")
-                percent = disk.get("percent_used")
-                
-                if path and percent is not None:
-                    try:
-                        percent_val = float(percent)
-                        if percent_val > DISK_THRESHOLD:
-                            server_name = host.get("name", "Unknown Server")
-                            alert_key = f"disk_usage:{server_name}:{path}"
-                            
-                            # Define notification callback
-                            async def send_notification():
-                                msg = f"Disk usage on {server_name} ({path}) is critical: {percent_val}%"
-                                logger.warning(f"ALERT: {msg}")
-                                
-                                # Get logged in users from system metrics
-                                current_users = [u.get("name") for u in system.get("users", []) if u.get("name")]
-                                
-                                url = host.get("url")
-                                if url:
-                                    await nm.send_to_server_users(
-                                        server_url=url, 
-                                        title=f"Critical Disk Usage on {server_name}", 
-                                        body=msg, 
-                                        level="critical",
-                                        user_list=current_users
-                                    )
-                            
-                            # Report alert (will only notify if new)
-                            await am.report_alert(alert_key, send_notification)
-                    except (ValueError, TypeError):
-                        pass
+                if percent_val > DISK_THRESHOLD:
+                    alert_key = f"disk_usage:{server_name}:{path}"
+                    if host_users is None:
+                        host_users = host_usernames(host)
+
+                    # Report alert (will only notify if new); the partial binds this disk's values
+                    await am.report_alert(
+                        alert_key,
+                        functools.partial(_send_disk_alert, nm, server_name, url, path, percent_val, host_users),
+                    )
 
 async def root_process_check(hosts_data: List[Dict[str, Any]]):
     """
@@ -244,8 +425,10 @@ async def root_process_check(hosts_data: List[Dict[str, Any]]):
         server_name = host.get("name", "Unknown Server")
         gpus = host.get("gpus", [])
         
-        # Collect offending PIDs to avoid duplicate alerts per host in one cycle
+        # Collect offending PIDs to avoid duplicate alerts per host in one cycle;
+        # only the ones the message names get formatted, the rest are just counted
         root_procs = []
+        others = 0
         
         if isinstance(gpus, list):
             for gpu in gpus:
@@ -255,35 +438,20 @@ async def root_process_check(hosts_data: List[Dict[str, Any]]):
                 if isinstance(procs, list):
                     for p in procs:
                         # Check username. Exporter usually returns "root" or similar.
-                        user = p.get("username", "")
-                        if user == "root":
-                            root_procs.append(f"{p.get('command', 'unknown')} (PID {p.get('pid')})")
+                        if isinstance(p, dict) and p.get("username") == "root":
+                            if len(root_procs) < ROOT_PROCESSES_NAMED:
+                                root_procs.append(f"{p.get('command', 'unknown')} (PID {p.get('pid')})")
+                            else:
+                                others += 1
 
         if root_procs:
             # Found root processes
             alert_key = f"root_process:{server_name}"
-            
-            # Define notification callback
-            async def send_notification():
-                msg = f"Root user detected on GPU processes: {', '.join(root_procs[:3])}"
-                if len(root_procs) > 3:
-                    msg += f" and {len(root_procs)-3} others..."
-                msg += ". Please relaunch with your own user!"
-                
-                logger.warning(f"ALERT: {msg}")
-                
-                system = host.get("system", {})
-                current_users = [u.get("name") for u in system.get("users", []) if u.get("name")]
-                
-                url = host.get("url")
-                if url:
-                    await nm.send_to_server_users(
-                        server_url=url, 
-                        title=f"Root Process Detected on {server_name}", 
-                        body=msg, 
-                        level="warning",
-                        user_list=current_users
-                    )
-            
+            url = host.get("url")
+            host_users = host_usernames(host)
+
             # Report alert (will only notify if new)
-            await am.report_alert(alert_key, send_notification)
+            await am.report_alert(
+                alert_key,
+                functools.partial(_send_root_process_alert, nm, server_name, url, root_procs, others, host_users),
+            )
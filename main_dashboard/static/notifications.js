@@ -54,6 +54,15 @@ class NotificationService {
             }
         });
 
+        this.eventSource.addEventListener('dropped', (e) => {
+            try {
+                const data = JSON.parse(e.data);
+                console.warn(`${data.count} notifications were dropped because this tab fell behind`);
+            } catch (err) {
+                console.error("Error parsing dropped-notification data:", err);
+            }
+        });
+
         this.eventSource.onerror = (e) => {
             console.log("Notification stream error, reconnecting in " + this.retryTimeout + "ms");
             this.eventSource.close();
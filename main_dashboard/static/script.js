@@ -711,7 +711,7 @@ class DashboardApp {
                     <h4>
                         ${escapedGpuName} (ID: ${gpu.id})
                         <span style="font-size:0.8em; font-weight:400; color:var(--text-secondary)">
-                            ${gpu.temperature_celsius}°C | Fan: ${gpu.fan_speed_percent}% | Power: ${gpu.power_usage_watts}/${gpu.power_limit_watts}W
+                            ${gpu.temperature_celsius}°C | Fan: ${gpu.fan_speed_percent}% | Power: ${this._round2(gpu.power_usage_watts)}/${this._round2(gpu.power_limit_watts)}W
                         </span>
                     </h4>
                     <div class="metrics-grid" style="grid-template-columns: 1fr 1fr; gap:0.5rem; margin-bottom:1rem;">
@@ -742,7 +742,7 @@ class DashboardApp {
                 dEl.className = 'metric-item';
                 dEl.innerHTML = `
                     <strong>${disk.label}</strong>
-                    <small>${disk.used_gb} / ${disk.total_gb} GB</small>
+                    <small>${this._round2(disk.used_gb)} / ${this._round2(disk.total_gb)} GB</small>
                     <div class="progress-bar-container">
                         <div class="progress-bar ${this._getUsageClass(disk.percent_used)}" style="width:${disk.percent_used}%"></div>
                     </div>
@@ -1105,6 +1105,11 @@ class DashboardApp {
 
     // --- Helpers ---
 
+    // Exporters send unrounded values; show at most two decimals
+    _round2(value) {
+        return typeof value === 'number' ? Math.round(value * 100) / 100 : value;
+    }
+
     _updateMetric(card, valSelector, barSelector, value, unit = '', isError = false) {
         const valEl = card.querySelector(valSelector);
         const barEl = card.querySelector(barSelector);
@@ -1,4 +1,8 @@
+import asyncio
+import threading
+import time
 from datetime import timedelta
+from types import SimpleNamespace
 
 import main_dashboard.main_app as dashboard
 
@@ -21,7 +25,7 @@ def make_sample_host(name="TestHost", error=None):
 
 
 def test_host_metrics_cache_force_refresh(monkeypatch, sample_exporter_payload):
-    async def fake_fetch():
+    async def fake_fetch(on_host_done=None):
         return [sample_exporter_payload]
 
     custom_cache = dashboard.HostMetricsCache(
@@ -49,7 +53,7 @@ def test_host_metrics_cache_refreshes_when_stale(monkeypatch):
         "refresh": 0,
     }
 
-    async def fake_fetch():
+    async def fake_fetch(on_host_done=None):
         calls["refresh"] += 1
         return [make_sample_host("stale-host")]
 
@@ -60,9 +64,214 @@ def test_host_metrics_cache_refreshes_when_stale(monkeypatch):
     assert data and calls["refresh"] == 1
 
     # Simulate stale cache by rewinding last refresh timestamp
-    cache._last_refresh = dashboard.utc_now() - timedelta(seconds=5)
-    data, _ = cache.get_data()
-    assert data and calls["refresh"] == 2
+    stale_refresh = dashboard.utc_now() - timedelta(seconds=5)
+    cache._state = cache._state._replace(last_refresh=stale_refresh)
+    data, snapshot = cache.get_data()
+    # The stale snapshot is served right away while the refresh runs in the background
+    assert data and snapshot["stale_for_seconds"] >= 5
+    cache._revalidation.result(timeout=5)
+    assert calls["refresh"] == 2
+    assert cache._state.last_refresh > stale_refresh
+
+
+def test_concurrent_forced_refreshes_share_one_fetch(monkeypatch):
+    calls = {"refresh": 0}
+
+    async def fake_fetch(on_host_done=None):
+        calls["refresh"] += 1
+        await asyncio.sleep(0.2)
+        return [make_sample_host("shared-host")]
+
+    cache = dashboard.HostMetricsCache(refresh_interval=1, stale_after=2)
+    monkeypatch.setattr(dashboard, "fetch_all_hosts_data", fake_fetch)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_data(force_refresh=True)[0]))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # Callers arriving after the first fetch started share one follow-up fetch rather than each starting one
+    assert calls["refresh"] <= 2
+    assert len(results) == 8
+    assert all(data[0]["name"] == "shared-host" for data in results)
+
+
+def test_forced_refresh_after_reload_does_not_join_fetch_of_old_hosts(monkeypatch, tmp_path):
+    started = []
+
+    async def fake_fetch(on_host_done=None):
+        hosts = list(dashboard.MONITORED_HOSTS)
+        started.append([host["name"] for host in hosts])
+        await asyncio.sleep(0.2 if len(started) == 1 else 0)
+        return [make_sample_host(host["name"]) for host in hosts]
+
+    config_path = tmp_path / "hosts_config.json"
+    config_path.write_text('[{"name": "new-host", "api_url": "http://new/metrics"}]')
+    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", [{"name": "old-host", "api_url": "http://old/metrics"}])
+    monkeypatch.setattr(dashboard, "HOST_CONFIG_PATH", str(config_path))
+    monkeypatch.setattr(dashboard, "fetch_all_hosts_data", fake_fetch)
+    cache = dashboard.HostMetricsCache(refresh_interval=5, stale_after=10)
+
+    tick = dashboard.async_loop.submit(cache._refresh())
+    deadline = time.monotonic() + 5
+    while not started and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    dashboard.load_host_config()
+    data, _ = cache.get_data(force_refresh=True)
+
+    assert started == [["old-host"], ["new-host"]]
+    assert [host["name"] for host in data] == ["new-host"]
+    tick.result(timeout=5)
+
+
+def test_background_loop_skips_tick_after_forced_refresh(monkeypatch):
+    calls = {"refresh": 0}
+
+    async def fake_fetch(on_host_done=None):
+        calls["refresh"] += 1
+        return [make_sample_host("loop-host")]
+
+    cache = dashboard.HostMetricsCache(refresh_interval=5, stale_after=10)
+    monkeypatch.setattr(dashboard, "fetch_all_hosts_data", fake_fetch)
+
+    cache.get_data(force_refresh=True)
+    cache.start()
+    try:
+        time.sleep(0.3)
+    finally:
+        cache.stop()
+    # The loop's first tick is due a full interval after the forced refresh, not right away
+    assert calls["refresh"] == 1
+
+
+def test_async_loop_thread_reuses_one_loop():
+    runner = dashboard.AsyncLoopThread()
+
+    async def running_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        assert runner.run(running_loop()) is runner.run(running_loop())
+    finally:
+        runner.stop()
+
+
+def test_fetch_all_hosts_data_bounds_concurrency_and_keeps_order(monkeypatch):
+    hosts = [{"name": f"host{i}", "api_url": f"http://h{i}/metrics"} for i in range(5)]
+    active = {"now": 0, "max": 0}
+
+    async def fake_fetch(client, host_config):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        try:
+            await asyncio.sleep(5 if host_config["name"] == "host1" else 0.01)
+        finally:
+            active["now"] -= 1
+        return make_sample_host(host_config["name"])
+
+    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", hosts)
+    monkeypatch.setattr(dashboard, "fetch_single_host_data", fake_fetch)
+    monkeypatch.setattr(dashboard, "FETCH_CONCURRENCY", 2)
+    monkeypatch.setattr(dashboard, "FETCH_ALL_TIMEOUT_SECONDS", 0.2)
+
+    results = asyncio.run(dashboard.fetch_all_hosts_data())
+
+    assert [r["name"] for r in results] == [h["name"] for h in hosts]
+    assert active["max"] == 2
+    assert "no response within" in results[1]["error"]
+    assert all(r["error"] is None for i, r in enumerate(results) if i != 1)
+
+
+def test_cache_publishes_fast_hosts_before_slow_ones_finish(monkeypatch):
+    hosts = [{"name": "fast", "api_url": "http://fast/metrics"}, {"name": "slow", "api_url": "http://slow/metrics"}]
+    release_slow = asyncio.Event()
+    rounds = {"fast": 0}
+
+    async def fake_fetch(client, host_config):
+        if host_config["name"] == "slow" and rounds["fast"] > 1:
+            await release_slow.wait()
+        elif host_config["name"] == "fast":
+            rounds["fast"] += 1
+        return make_sample_host(host_config["name"]) | {"round": rounds["fast"]}
+
+    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", hosts)
+    monkeypatch.setattr(dashboard, "fetch_single_host_data", fake_fetch)
+    cache = dashboard.HostMetricsCache(refresh_interval=5, stale_after=10)
+    cache.get_data(force_refresh=True)
+    first_refresh = cache.snapshot()["last_refresh_utc"]
+
+    pending = dashboard.async_loop.submit(cache._refresh())
+    deadline = time.monotonic() + 5
+    while cache.snapshot()["data"][0]["round"] != 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    snapshot = cache.snapshot()
+    assert [host["round"] for host in snapshot["data"]] == [2, 1]
+    assert dashboard.orjson.loads(snapshot["data_json"]) == snapshot["data"]
+    assert snapshot["last_refresh_utc"] == first_refresh
+
+    async def release():
+        release_slow.set()
+
+    dashboard.async_loop.run(release(), timeout=5)
+    pending.result(timeout=5)
+    assert [host["round"] for host in cache.snapshot()["data"]] == [2, 2]
+
+
+def test_host_publishes_within_one_window_share_one_generation():
+    cache = dashboard.HostMetricsCache(refresh_interval=5, stale_after=10)
+    cache._update_cache([make_sample_host(f"host{i}") for i in range(3)])
+    generation = cache._state.generation
+
+    async def finish_hosts():
+        for i in range(3):
+            cache._publish_host(i, make_sample_host(f"host{i}") | {"round": 2})
+        await asyncio.sleep(dashboard.HOST_PUBLISH_COALESCE_SECONDS * 2)
+
+    dashboard.async_loop.run(finish_hosts(), timeout=5)
+
+    state = cache._state
+    assert state.generation == generation + 1
+    assert [host["round"] for host in state.data] == [2, 2, 2]
+    assert dashboard.orjson.loads(state.data_json) == state.data
+
+
+def test_utc_now_iso_matches_datetime_format():
+    before = dashboard.utc_now()
+    stamp = dashboard.utc_now_iso()
+    after = dashboard.utc_now()
+
+    assert stamp.endswith("Z") and len(stamp) == len("2024-01-01T12:00:00.123456Z")
+    parsed = dashboard.datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    assert before <= parsed <= after
+
+
+def test_client_interval_tracker_expires_idle_clients(monkeypatch):
+    clock = {"now": 1000.0}
+    # Swap main_app's time module only; patching time.monotonic itself would skew the shared event loop
+    monkeypatch.setattr(dashboard, "time", SimpleNamespace(monotonic=lambda: clock["now"]))
+    tracker = dashboard.ClientIntervalTracker(fallback_interval=10.0, idle_multiplier=2.0, min_idle_seconds=5.0)
+
+    tracker.update("fast", 5)
+    tracker.update("slow", 20)
+    assert tracker.effective_interval() == 5
+    assert tracker.active_clients() == 2
+
+    # "fast" idles out after 10s; refreshing "slow" must not keep its stale heap entry alive
+    clock["now"] += 11
+    tracker.update("slow", 20)
+    assert tracker.effective_interval() == 20
+    assert tracker.active_clients() == 1
+
+    clock["now"] += 41
+    assert tracker.effective_interval() == 10.0
+    assert tracker.active_clients() == 0
 
 
 def test_api_data_returns_cached_payload(monkeypatch):
@@ -92,6 +301,29 @@ def test_api_data_returns_cached_payload(monkeypatch):
     assert payload["metadata"]["served_from"] == "forced"
 
 
+def test_api_data_answers_conditional_get_until_next_refresh(monkeypatch):
+    async def fake_fetch(on_host_done=None):
+        return [make_sample_host("etag-host")]
+
+    cache = dashboard.HostMetricsCache(refresh_interval=5, stale_after=10)
+    monkeypatch.setattr(dashboard, "fetch_all_hosts_data", fake_fetch)
+    monkeypatch.setattr(dashboard, "host_cache", cache)
+    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", [{"name": "etag-host", "api_url": "http://localhost"}])
+    client = dashboard.app.test_client()
+
+    first = client.get("/api/data")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    cached = client.get("/api/data", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.data == b""
+
+    # A forced refresh always returns a body, and a new generation gets a new tag
+    forced = client.get("/api/data?fresh=1", headers={"If-None-Match": etag})
+    assert forced.status_code == 200 and forced.headers["ETag"] != etag
+    assert client.get("/api/data", headers={"If-None-Match": etag}).status_code == 200
+
+
 def test_api_data_adjusts_refresh_interval_to_fastest_client(monkeypatch):
     client = dashboard.app.test_client()
     sample_data = [make_sample_host("tracked-host")]
@@ -1,7 +1,7 @@
 
 import unittest
-from unittest.mock import patch, MagicMock
-import json
+from unittest.mock import patch
+import httpx
 import sys
 import os
 
@@ -13,55 +13,69 @@ from exporter import get_docker_metrics
 class TestDockerMetrics(unittest.TestCase):
 
     @patch('os.path.exists')
-    @patch('subprocess.check_output')
-    def test_get_docker_metrics_success(self, mock_subprocess, mock_exists):
+    def test_get_docker_metrics_success(self, mock_exists):
         # Mock socket existence
         mock_exists.return_value = True
 
-        # Mock outputs
-        # 1. Containers
-        containers_json = [
-            {"ID": "c1", "Image": "img1", "Status": "Up", "Names": "container1", "Size": "10MB"},
-            {"ID": "c2", "Image": "img2", "Status": "Exited", "Names": "container2", "Size": "20MB"}
-        ]
-        output_containers = "\n".join([json.dumps(c) for c in containers_json])
+        # Mock Engine API responses
+        # 1. Disk usage (includes containers with sizes)
+        system_df = {
+            "LayersSize": 300_000_000,
+            "Images": [
+                {"Id": "sha256:i1", "Containers": 1, "Size": 100_000_000},
+                {"Id": "sha256:i2", "Containers": 0, "Size": 200_000_000},
+            ],
+            "Containers": [
+                {"Id": "c1" * 32, "Names": ["/container1"], "Image": "img1", "State": "running",
+                 "Status": "Up 2 hours", "Created": 200, "SizeRw": 10_000_000, "SizeRootFs": 110_000_000},
+                {"Id": "c2" * 32, "Names": ["/container2"], "Image": "img2", "State": "exited",
+                 "Status": "Exited (0)", "Created": 100, "SizeRw": 20_000_000, "SizeRootFs": 220_000_000},
+            ],
+            "Volumes": [],
+            "BuildCache": [{"Size": 50_000_000, "Shared": False}],
+        }
 
         # 2. Images
         images_json = [
-            {"Repository": "repo1", "Tag": "latest", "ID": "i1", "Size": "100MB"},
-            {"Repository": "repo2", "Tag": "v1", "ID": "i2", "Size": "200MB"}
-        ]
-        output_images = "\n".join([json.dumps(i) for i in images_json])
-
-        # 3. Summary
-        summary_json = [
-             {"Type": "Images", "TotalCount": 2, "Size": "300MB"},
-             {"Type": "Containers", "TotalCount": 2, "Running": 1, "Size": "30MB"},
-             {"Type": "Local Volumes", "TotalCount": 0, "Size": "0B"},
-             {"Type": "Build Cache", "Size": "50MB"}
+            {"Id": "sha256:i1", "RepoTags": ["repo1:latest"], "Created": 2, "Size": 100_000_000},
+            {"Id": "sha256:i2", "RepoTags": ["registry:5000/repo2:v1"], "Created": 1, "Size": 200_000_000},
         ]
-        output_summary = "\n".join([json.dumps(s) for s in summary_json])
 
-        # Check_output side effects
-        mock_subprocess.side_effect = [
-            output_containers.encode('utf-8'),
-            output_images.encode('utf-8'),
-            output_summary.encode('utf-8')
-        ]
+        routes = {"/system/df": system_df, "/images/json": images_json}
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=routes[request.url.path]))
+        client = httpx.Client(transport=transport, base_url="http://docker")
 
-        metrics = get_docker_metrics()
+        with patch('exporter._docker_client', client):
+            metrics = get_docker_metrics()
 
         self.assertIn("containers", metrics)
         self.assertEqual(len(metrics["containers"]), 2)
-        self.assertEqual(metrics["containers"][0]["ID"], "c1")
-        
+        self.assertEqual(metrics["containers"][0]["ID"], "c1c1c1c1c1c1")
+        self.assertEqual(metrics["containers"][0]["Names"], "container1")
+        self.assertEqual(metrics["containers"][0]["Size"], "10MB (virtual 110MB)")
+
         self.assertIn("images", metrics)
         self.assertEqual(len(metrics["images"]), 2)
-        
+        self.assertEqual(metrics["images"][1]["Repository"], "registry:5000/repo2")
+        self.assertEqual(metrics["images"][1]["Tag"], "v1")
+
         self.assertIn("summary", metrics)
         self.assertEqual(metrics["summary"]["Images"]["TotalCount"], 2)
+        self.assertEqual(metrics["summary"]["Images"]["Size"], "300MB")
+        self.assertEqual(metrics["summary"]["Containers"]["Running"], 1)
         self.assertEqual(metrics["summary"]["Build Cache"]["Size"], "50MB")
 
+    @patch('os.path.exists')
+    def test_get_docker_metrics_api_error(self, mock_exists):
+        mock_exists.return_value = True
+        transport = httpx.MockTransport(lambda request: httpx.Response(500, text="daemon error"))
+        client = httpx.Client(transport=transport, base_url="http://docker")
+
+        with patch('exporter._docker_client', client):
+            metrics = get_docker_metrics()
+
+        self.assertEqual(metrics, {"error": "Docker API request failed: 500 daemon error"})
+
     @patch('os.path.exists')
     def test_get_docker_metrics_no_socket(self, mock_exists):
         mock_exists.return_value = False
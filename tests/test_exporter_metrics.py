@@ -1,47 +1,184 @@
+import asyncio
+import collections
+import contextlib
+import threading
+import time
+
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from typing import Iterable
 
 import exporter_node.exporter as exporter
 
+# nvitop's utilization_rates() result; only .gpu is read
+Util = collections.namedtuple("Util", ["gpu"])
+_UTIL_82 = Util(82)
 
-@pytest.fixture
-def exporter_client(monkeypatch, sample_system_metrics, sample_gpu_metrics):
-    """Provide a TestClient with patched metric collectors."""
-    monkeypatch.setattr(exporter, "get_system_metrics", lambda: sample_system_metrics)
-    monkeypatch.setattr(exporter, "get_gpu_metrics", lambda: sample_gpu_metrics)
+
+def _boom(*args, **kwargs):
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def reset_exporter_caches():
+    """Each test patches the collectors, so start without cached device handles or payloads."""
+    exporter._invalidate_gpu_devices()
+    exporter._metrics_cache.clear()
+    exporter._login_users_cache = (None, [])
+    yield
+    exporter._invalidate_gpu_devices()
+    exporter._metrics_cache.clear()
+    exporter._login_users_cache = (None, [])
+
+
+@pytest.fixture(scope="module")
+def app_client():
+    """One TestClient per module; tests patch the collectors, never the app, so it can be shared."""
     return TestClient(exporter.app)
 
 
-def test_get_system_metrics_success(monkeypatch, sample_disk_entries):
+@pytest.fixture
+def exporter_client(app_client, monkeypatch, sample_system_metrics, sample_gpu_metrics, sample_disk_entries):
+    """Provide the shared TestClient with patched metric collectors."""
+    system_without_disks = {k: v for k, v in sample_system_metrics.items() if k != "disks"}
+    monkeypatch.setattr(exporter, "get_system_metrics", lambda: system_without_disks)
+    monkeypatch.setattr(exporter, "get_disk_metrics", lambda: sample_disk_entries)
+    monkeypatch.setattr(exporter, "get_gpu_metrics", lambda include_processes=True: sample_gpu_metrics)
+    return app_client
+
+
+@pytest.fixture
+async def async_exporter_client(exporter_client):
+    """Drive the app on the test's own event loop, so requests can be gathered without a portal thread."""
+    transport = httpx.ASGITransport(app=exporter.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+def test_get_system_metrics_success(monkeypatch):
     class FakeVMem:
         total = 64 * 1024 ** 3
         used = 21.5 * 1024 ** 3
         percent = 33.6
 
-    monkeypatch.setattr(exporter.psutil, "cpu_percent", lambda interval=0.5: 42.0)
-    monkeypatch.setattr(exporter.psutil, "virtual_memory", lambda: FakeVMem)
-    monkeypatch.setattr(exporter.psutil, "cpu_count", lambda logical=True: 32)
-    monkeypatch.setattr(exporter.os, "getloadavg", lambda: (1.2, 0.8, 0.5))
-    monkeypatch.setattr(exporter, "get_disk_metrics", lambda: sample_disk_entries)
-
-    metrics = exporter.get_system_metrics()
+    # Patched only while collecting, and undone in one pass before the assertions
+    with monkeypatch.context() as m:
+        m.setattr(exporter.psutil, "cpu_percent", lambda interval=0.5: 42.0)
+        m.setattr(exporter.psutil, "virtual_memory", lambda: FakeVMem)
+        m.setattr(exporter.psutil, "cpu_count", lambda logical=True: 32)
+        m.setattr(exporter.os, "getloadavg", lambda: (1.2, 0.8, 0.5))
+        metrics = exporter.get_system_metrics()
 
     assert metrics["cpu_percent"] == pytest.approx(42.0)
     assert metrics["memory_total_gb"] == pytest.approx(64.0)
     assert metrics["load_average_5m"] == pytest.approx(0.8, rel=1e-3)
-    assert metrics["disks"] == sample_disk_entries
+    assert "disks" not in metrics
 
 
-def test_get_system_metrics_handles_exception(monkeypatch):
-    def boom(*args, **kwargs):
-        raise RuntimeError("psutil failure")
+def test_get_system_metrics_uses_background_cpu_sample(monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("cpu_percent should not be measured inline")
 
-    monkeypatch.setattr(exporter.psutil, "cpu_percent", boom)
+    monkeypatch.setattr(exporter, "_cpu_percent_sample", 12.5)
+    monkeypatch.setattr(exporter.psutil, "cpu_percent", unexpected)
+
+    metrics = exporter.get_system_metrics()
+
+    assert metrics["cpu_percent"] == pytest.approx(12.5)
+
+
+def test_get_system_metrics_handles_exception(monkeypatch):
+    monkeypatch.setattr(exporter.psutil, "cpu_percent", _boom)
 
     result = exporter.get_system_metrics()
     assert result["error"].startswith("Could not retrieve system metrics")
-    assert result["disks"] == []
+    assert result["cpu_percent"] is None
+
+
+def test_logged_in_users_rereads_only_when_utmp_changes(monkeypatch, tmp_path):
+    utmp = tmp_path / "utmp"
+    utmp.write_bytes(b"")
+    calls = []
+
+    def fake_users():
+        calls.append(1)
+        return [type("User", (), {"name": "alice", "terminal": "pts/0", "host": "", "started": 1.0})()]
+
+    monkeypatch.setattr(exporter, "UTMP_PATH", str(utmp))
+    monkeypatch.setattr(exporter.psutil, "users", fake_users)
+
+    assert exporter._logged_in_users() == [{"name": "alice", "terminal": "pts/0", "host": "N/A", "started": 1.0}]
+    exporter._logged_in_users()
+    assert len(calls) == 1
+
+    stat = utmp.stat()
+    exporter.os.utime(utmp, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    exporter._logged_in_users()
+    assert len(calls) == 2
+
+
+def test_get_disk_metrics_reuses_targets_within_ttl(monkeypatch):
+    calls = []
+
+    def fake_partitions(all=False):
+        calls.append(1)
+        return []
+
+    monkeypatch.setattr(exporter, "_disk_targets_cache", {"ts": float("-inf"), "targets": {}})
+    monkeypatch.setattr(exporter.psutil, "disk_partitions", fake_partitions)
+    monkeypatch.setattr(exporter, "_mounts_changed", lambda: False)
+
+    first = exporter.get_disk_metrics()
+    second = exporter.get_disk_metrics()
+
+    assert len(calls) == 1
+    assert [d["path"] for d in first] == [d["path"] for d in second]
+    assert first[0]["path"] == "/"
+
+
+def test_get_disk_metrics_refreshes_targets_on_mount_change(monkeypatch):
+    calls = []
+
+    def fake_partitions(all=False):
+        calls.append(1)
+        return []
+
+    monkeypatch.setattr(exporter, "_disk_targets_cache", {"ts": float("-inf"), "targets": {}})
+    monkeypatch.setattr(exporter.psutil, "disk_partitions", fake_partitions)
+    monkeypatch.setattr(exporter, "_mounts_changed", lambda: True)
+
+    exporter.get_disk_metrics()
+    exporter.get_disk_metrics()
+
+    assert len(calls) == 2
+
+
+def test_get_disk_metrics_times_out_hung_mount(monkeypatch):
+    release = threading.Event()
+    calls = []
+    real_statvfs = exporter.os.statvfs
+
+    def hung_statvfs(path):
+        calls.append(path)
+        release.wait(5)
+        return real_statvfs("/")
+
+    monkeypatch.setattr(exporter, "_disk_targets_cache", {"ts": time.monotonic(), "targets": {"/": "Root (/)"}})
+    monkeypatch.setattr(exporter, "_disk_pending", {})
+    monkeypatch.setattr(exporter, "_mounts_changed", lambda: False)
+    monkeypatch.setattr(exporter, "DISK_USAGE_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(exporter.os, "statvfs", hung_statvfs)
+
+    try:
+        assert exporter.get_disk_metrics() == [{"path": "/", "label": "Root (/)", "error": "Timed out"}]
+        # The stuck call is not resubmitted while it is still outstanding
+        assert exporter.get_disk_metrics()[0]["error"] == "Timed out"
+        assert calls == ["/"]
+    finally:
+        release.set()
+
+    exporter._disk_pending["/"].result(timeout=5)
+    assert "total_gb" in exporter.get_disk_metrics()[0]
 
 
 def test_get_gpu_metrics_no_devices(monkeypatch):
@@ -51,15 +188,27 @@ def test_get_gpu_metrics_no_devices(monkeypatch):
 
 
 def test_get_gpu_metrics_with_single_device(monkeypatch):
-    class FakeSnapshot:
-        pid = 4321
-        username = "bob"
-        command = "python render.py"
-        gpu_memory = 2 * 1024 ** 3  # bytes
-        cpu_percent = 9.25
+    class FakeHostProcess:
+        def __init__(self, pid):
+            assert pid == 4321
+
+        def oneshot(self):
+            return contextlib.nullcontext()
+
+        def username(self):
+            return "bob"
+
+        def cmdline(self):
+            return ["python", "render.py"]
+
+        def cpu_percent(self):
+            return 9.25
 
     class FakeGpuProcess:
-        pass
+        pid = 4321
+
+        def gpu_memory(self):
+            return 2 * 1024 ** 3  # bytes
 
     class FakeDevice:
         index = 0
@@ -70,8 +219,11 @@ def test_get_gpu_metrics_with_single_device(monkeypatch):
         def uuid(self):
             return "GPU-FAKE-001"
 
+        def oneshot(self):
+            return contextlib.nullcontext()
+
         def utilization_rates(self):
-            return type("Util", (), {"gpu": 82})()
+            return _UTIL_82
 
         def memory_total(self):
             return 12 * 1024 ** 3
@@ -94,20 +246,41 @@ def test_get_gpu_metrics_with_single_device(monkeypatch):
         def processes(self):
             return {0: FakeGpuProcess()}
 
-    def fake_take_snapshots(cls, processes: Iterable, failsafe: bool = True):
-        return [FakeSnapshot()]
-
     monkeypatch.setattr(exporter.nvitop.Device, "all", classmethod(lambda cls: [FakeDevice()]))
-    monkeypatch.setattr(exporter.nvitop.GpuProcess, "take_snapshots", classmethod(fake_take_snapshots))
+    monkeypatch.setattr(exporter.psutil, "Process", FakeHostProcess)
+    monkeypatch.setattr(exporter, "_host_processes", {})
 
     metrics = exporter.get_gpu_metrics()
 
     assert len(metrics) == 1
     gpu = metrics[0]
     assert gpu["name"] == "Mock RTX"
+    assert gpu["utilization_gpu_percent"] == 82
     assert gpu["power_usage_watts"] == pytest.approx(110.0)
     assert gpu["memory_percent"] == pytest.approx(50.0)
     assert gpu["processes"][0]["gpu_memory_used_mib"] == pytest.approx(2048.0)
+    assert gpu["processes"][0]["username"] == "bob"
+    assert gpu["processes"][0]["command"] == "python render.py"
+    assert gpu["processes"][0]["cpu_percent"] == pytest.approx(9.25)
+
+    without_processes = exporter.get_gpu_metrics(include_processes=False)
+    assert without_processes[0]["processes"] == []
+    assert without_processes[0]["utilization_gpu_percent"] == 82
+
+
+def test_get_gpu_metrics_enumerates_devices_once(monkeypatch):
+    calls = []
+
+    def fake_all(cls):
+        calls.append(1)
+        return []
+
+    monkeypatch.setattr(exporter.nvitop.Device, "all", classmethod(fake_all))
+
+    exporter.get_gpu_metrics()
+    exporter.get_gpu_metrics()
+
+    assert len(calls) == 1
 
 
 def test_metrics_endpoint_returns_payload(exporter_client, sample_system_metrics, sample_gpu_metrics):
@@ -116,21 +289,119 @@ def test_metrics_endpoint_returns_payload(exporter_client, sample_system_metrics
     payload = response.json()
     assert payload["system"] == sample_system_metrics
     assert payload["gpus"] == sample_gpu_metrics
-    assert "timestamp_utc" in payload
+    assert payload["timestamp_utc"].endswith("Z")
+
+
+def test_metrics_endpoint_sets_cache_control(exporter_client):
+    response = exporter_client.get("/metrics")
+    assert response.headers["cache-control"] == f"max-age={int(exporter.CACHE_TTL_SECONDS)}"
+
+
+def test_metrics_endpoint_can_skip_processes(exporter_client, monkeypatch):
+    seen = []
+    monkeypatch.setattr(exporter, "get_gpu_metrics", lambda include_processes=True: seen.append(include_processes) or [])
+
+    response = exporter_client.get("/metrics", params={"processes": "false"})
+
+    assert response.status_code == 200
+    assert seen == [False]
+
+
+def test_concurrent_metrics_requests_share_one_collection(monkeypatch, sample_system_metrics, sample_gpu_metrics):
+    calls = []
+
+    def slow_gpu_metrics(include_processes=True):
+        calls.append(1)
+        time.sleep(0.05)
+        return sample_gpu_metrics
+
+    monkeypatch.setattr(exporter, "get_system_metrics", lambda: sample_system_metrics)
+    monkeypatch.setattr(exporter, "get_disk_metrics", lambda: [])
+    monkeypatch.setattr(exporter, "get_gpu_metrics", slow_gpu_metrics)
+
+    async def scrape_concurrently():
+        return await asyncio.gather(*(exporter.read_metrics() for _ in range(5)))
+
+    responses = asyncio.run(scrape_concurrently())
+
+    assert len(calls) == 1
+    assert len({r.body for r in responses}) == 1
+
+
+def test_collect_metrics_payload_survives_disk_collector_failure(monkeypatch, sample_system_metrics, sample_gpu_metrics):
+    monkeypatch.setattr(exporter, "get_system_metrics", lambda: sample_system_metrics)
+    monkeypatch.setattr(exporter, "get_disk_metrics", _boom)
+    monkeypatch.setattr(exporter, "get_gpu_metrics", lambda include_processes=True: sample_gpu_metrics)
+
+    payload = exporter.collect_metrics_payload()
+
+    assert payload["system"]["disks"] == []
+    assert payload["system"]["cpu_percent"] == sample_system_metrics["cpu_percent"]
+    assert payload["gpus"] == sample_gpu_metrics
+
+
+def test_metrics_endpoint_serves_collector_snapshot(app_client, monkeypatch, sample_gpu_metrics):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("the request path should not collect while the collector runs")
 
+    gpus = [{**sample_gpu_metrics[0], "processes": [{"pid": 1}]}]
+    snapshot = {"hostname": "node", "timestamp_utc": "t", "system": {}, "gpus": gpus, "docker": {}}
+    monkeypatch.setattr(exporter, "_metrics_collector_running", True)
+    monkeypatch.setattr(exporter, "collect_metrics_payload", unexpected)
+    exporter._cache_metrics(True, snapshot)
 
-def test_metrics_endpoint_handles_exception(monkeypatch):
-    # Reset cache to ensure we hit the logic that raises exception
-    exporter._metrics_cache = None
-    exporter._cache_timestamp = 0
-    monkeypatch.setattr(exporter, "get_system_metrics", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
-    client = TestClient(exporter.app)
-    response = client.get("/metrics")
+    assert app_client.get("/metrics").json()["gpus"][0]["processes"] == [{"pid": 1}]
+    assert app_client.get("/metrics", params={"processes": "false"}).json()["gpus"][0]["processes"] == []
+
+
+def test_metrics_endpoint_handles_exception(app_client, monkeypatch):
+    monkeypatch.setattr(exporter, "get_system_metrics", _boom)
+    response = app_client.get("/metrics")
     assert response.status_code == 500
     assert "Internal server error" in response.text
 
 
-def test_health_endpoint(exporter_client):
-    response = exporter_client.get("/health")
-    assert response.status_code == 200
-    assert response.json() == {"status": "ok"}
+def test_users_endpoint_reuses_listing_until_passwd_changes(exporter_client, monkeypatch):
+    calls = []
+    passwd_mtime = {"ns": 1}
+
+    def fake_getpwall():
+        calls.append(1)
+        return [
+            exporter.pwd.struct_passwd(("root", "x", 0, 0, "", "/root", "/bin/sh")),
+            exporter.pwd.struct_passwd(("daemon", "x", 1, 1, "", "/", "/bin/false")),
+            exporter.pwd.struct_passwd(("alice", "x", 1000, 1000, "", "/home/alice", "/bin/sh")),
+        ]
+
+    real_stat = exporter.os.stat
+
+    def fake_stat(path, *args, **kwargs):
+        if path == "/etc/passwd":
+            return type("Stat", (), {"st_mtime_ns": passwd_mtime["ns"]})()
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(exporter, "_users_cache", {"mtime": None, "ts": float("-inf"), "users": []})
+    monkeypatch.setattr(exporter.pwd, "getpwall", fake_getpwall)
+    monkeypatch.setattr(exporter.os, "stat", fake_stat)
+
+    first = exporter_client.get("/users").json()
+    second = exporter_client.get("/users").json()
+    assert [u["username"] for u in first["users"]] == ["root", "alice"]
+    assert second == first
+    assert len(calls) == 1
+
+    passwd_mtime["ns"] = 2
+    exporter_client.get("/users")
+    assert len(calls) == 2
+
+
+async def test_health_and_metrics_endpoints_served_concurrently(async_exporter_client, sample_gpu_metrics):
+    health, metrics = await asyncio.gather(
+        async_exporter_client.get("/health"),
+        async_exporter_client.get("/metrics"),
+    )
+
+    assert health.status_code == 200
+    assert health.json() == {"status": "ok"}
+    assert metrics.status_code == 200
+    assert metrics.json()["gpus"] == sample_gpu_metrics
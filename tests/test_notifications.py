@@ -0,0 +1,210 @@
+import asyncio
+import sys
+
+import main_dashboard.main_app as dashboard
+
+# The notifications module exactly as main_app imported it (it shares main_app's import path)
+notifications = sys.modules[type(dashboard.nm).__module__]
+
+
+def make_manager():
+    # Bypass the singleton so each test starts without subscribers
+    manager = object.__new__(notifications.NotificationManager)
+    manager.init()
+    return manager
+
+
+def test_send_to_user_reaches_every_tab_of_that_user_only():
+    nm = make_manager()
+    first_tab = nm.subscribe("alice")
+    second_tab = nm.subscribe("alice")
+    other_user = nm.subscribe("bob")
+
+    nm.send_to_user("alice", "Disk", "almost full", level="critical")
+
+    assert [msg.title for msg in first_tab.wait(timeout=0)] == ["Disk"]
+    assert [msg.level for msg in second_tab.wait(timeout=0)] == ["critical"]
+    assert other_user.wait(timeout=0) == []
+
+
+def test_unsubscribe_publishes_a_new_subscriber_map():
+    nm = make_manager()
+    tab = nm.subscribe("alice")
+    before = nm._subscribers
+
+    nm.unsubscribe("alice", tab)
+
+    # Senders holding the old map keep a consistent view; the new one no longer has the user
+    assert before["alice"] == (tab,)
+    assert "alice" not in nm._subscribers
+    nm.broadcast("Maintenance", "tonight")
+    assert tab.wait(timeout=0) == []
+
+
+def test_notification_serializes_like_the_message_dict():
+    msg = notifications.Notification("Disk", "almost full", "critical", 12.5)
+
+    expected = {
+        "title": "Disk",
+        "body": "almost full",
+        "level": "critical",
+        "timestamp": 12.5,
+    }
+    assert dashboard.orjson.loads(dashboard.orjson.dumps(msg)) == expected
+    # The cached encoding is computed once and does not leak into the serialized fields
+    assert msg.json() is msg.json()
+    assert dashboard.orjson.loads(msg.json()) == expected
+
+
+def test_channel_drains_in_order_and_drops_oldest_when_full():
+    channel = notifications.SubscriberChannel()
+    for i in range(channel.MAX_PENDING + 5):
+        channel.put(notifications.Notification(str(i), "body", "info", 0.0))
+
+    messages = channel.wait(timeout=0)
+    assert len(messages) == channel.MAX_PENDING
+    assert messages[0].title == "5" and messages[-1].title == str(channel.MAX_PENDING + 4)
+    assert channel.dropped == 5
+    assert channel.wait(timeout=0.01) == []
+
+
+async def test_alert_checks_run_concurrently_and_failures_are_isolated():
+    am = object.__new__(notifications.AlertManager)
+    am.init()
+    started = []
+
+    async def slow_check(hosts_data):
+        started.append("slow")
+        await asyncio.sleep(0.05)
+        await am.report_alert("slow:alert", lambda: asyncio.sleep(0))
+
+    async def failing_check(hosts_data):
+        started.append("failing")
+        raise RuntimeError("boom")
+
+    def sync_check(hosts_data):
+        started.append("sync")
+
+    for check in (slow_check, failing_check, sync_check):
+        am.register_check(check)
+
+    await am.process_data([])
+
+    assert sorted(started) == ["failing", "slow", "sync"]
+    assert am.active_alerts == {"slow:alert"}
+
+
+async def test_alerts_from_one_cycle_reach_each_user_as_one_notification():
+    am = object.__new__(notifications.AlertManager)
+    am.init()
+    nm = notifications.NotificationManager()
+    alice, bob = nm.subscribe("alice"), nm.subscribe("bob")
+
+    async def disk_check(hosts_data):
+        await nm.send_to_server_users("http://h1", "Disk full", "/ at 95%", level="critical", user_list=["alice"])
+
+    async def root_check(hosts_data):
+        await nm.send_to_server_users("http://h1", "Root process", "python (PID 1)", level="warning", user_list=["alice", "bob"])
+
+    am.register_check(disk_check)
+    am.register_check(root_check)
+    try:
+        await am.process_data([])
+        alice_msgs, bob_msgs = alice.wait(timeout=0), bob.wait(timeout=0)
+    finally:
+        nm.unsubscribe("alice", alice)
+        nm.unsubscribe("bob", bob)
+
+    assert len(alice_msgs) == 1
+    assert alice_msgs[0].title == "2 new alerts" and alice_msgs[0].level == "critical"
+    assert "Disk full: / at 95%" in alice_msgs[0].body
+    assert [(msg.title, msg.level) for msg in bob_msgs] == [("Root process", "warning")]
+
+
+async def test_report_alert_fires_once_per_key_and_suppresses_flapping(monkeypatch):
+    am = object.__new__(notifications.AlertManager)
+    am.init()
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(notifications, "utc_now_timestamp", lambda: clock["now"])
+    fired = []
+
+    async def notify():
+        fired.append(clock["now"])
+
+    async def duplicate_check(hosts_data):
+        if hosts_data:
+            await am.report_alert("disk:h1:/", notify)
+            await am.report_alert("disk:h1:/", notify)
+
+    am.register_check(duplicate_check)
+
+    await am.process_data(["alerting"])
+    assert len(fired) == 1
+
+    # Clears, then re-fires 30s later: still inside the re-open window
+    await am.process_data([])
+    clock["now"] += 30
+    await am.process_data(["alerting"])
+    assert len(fired) == 1
+
+    await am.process_data([])
+    clock["now"] += notifications.ALERT_MIN_REOPEN_SECONDS
+    await am.process_data(["alerting"])
+    assert len(fired) == 2
+
+
+async def test_disk_usage_check_notifies_logged_in_users_per_disk(monkeypatch):
+    am = object.__new__(notifications.AlertManager)
+    am.init()
+    am.register_check(notifications.disk_usage_check)
+    monkeypatch.setattr(notifications.AlertManager, "_instance", am)
+    nm = notifications.NotificationManager()
+    alice = nm.subscribe("alice")
+    host = {
+        "name": "gpu1",
+        "url": "http://gpu1:8000",
+        "system": {
+            "users": [{"name": "alice"}, {"name": "alice"}, {"terminal": "pts/0"}],
+            "disks": [
+                {"path": "/", "percent_used": 95.0},
+                {"path": "/data", "percent_used": "97.5"},
+                {"path": "/tmp", "percent_used": 10.0},
+            ],
+        },
+    }
+    assert notifications.host_usernames(host) == {"alice"}
+
+    try:
+        await am.process_data([host])
+        messages = alice.wait(timeout=0)
+    finally:
+        nm.unsubscribe("alice", alice)
+
+    assert len(messages) == 1 and messages[0].title == "2 new alerts"
+    assert "(/) is critical: 95.0%" in messages[0].body
+    assert "(/data) is critical: 97.5%" in messages[0].body
+
+
+async def test_root_process_alert_names_three_and_counts_the_rest(monkeypatch):
+    am = object.__new__(notifications.AlertManager)
+    am.init()
+    am.register_check(notifications.root_process_check)
+    monkeypatch.setattr(notifications.AlertManager, "_instance", am)
+    nm = notifications.NotificationManager()
+    bob = nm.subscribe("bob")
+    procs = [{"username": "root", "command": f"train{i}", "pid": i} for i in range(5)]
+    host = {
+        "name": "gpu2",
+        "url": "http://gpu2:8000",
+        "system": {"users": [{"name": "bob"}]},
+        "gpus": [{"processes": procs[:2] + [{"username": "bob", "pid": 99}]}, {"processes": procs[2:]}],
+    }
+
+    try:
+        await am.process_data([host])
+        messages = bob.wait(timeout=0)
+    finally:
+        nm.unsubscribe("bob", bob)
+
+    assert len(messages) == 1
+    assert "train0 (PID 0), train1 (PID 1), train2 (PID 2) and 2 others..." in messages[0].body
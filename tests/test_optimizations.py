@@ -1,6 +1,9 @@
 import pytest
 import asyncio
+import operator
 import time
+from types import SimpleNamespace
+
 import httpx
 import main_dashboard.main_app as dashboard
 
@@ -9,6 +12,7 @@ async def test_fetch_users_list_caching(monkeypatch):
     # Setup
     dashboard._users_cache = {"data": [], "expiry": 0}
     mock_users = [{"username": "user1"}, {"username": "user2"}]
+    expected_users = sorted(mock_users, key=operator.itemgetter("username"))
     
     async def mock_fetch_from_host(client, host_conf):
         return mock_users
@@ -18,7 +22,7 @@ async def test_fetch_users_list_caching(monkeypatch):
     
     # First call: should fetch and cache
     users1 = await dashboard.fetch_users_list()
-    assert users1 == sorted(mock_users, key=lambda x: x["username"])
+    assert users1 == expected_users
     assert dashboard._users_cache["data"] == users1
     assert dashboard._users_cache["expiry"] > time.time()
     
@@ -30,34 +34,58 @@ async def test_fetch_users_list_caching(monkeypatch):
     
     # Second call: should return cached data
     users2 = await dashboard.fetch_users_list()
-    assert users2 == users1
+    assert users2 == expected_users
     assert users2 != [{"username": "other"}]
 
+@pytest.mark.asyncio
+async def test_fetch_users_list_ttl_expiry(monkeypatch):
+    cached = [{"username": "cached"}]
+    monkeypatch.setattr(dashboard, "_users_cache", {"data": cached, "expiry": 1000.0})
+    clock = {"now": 999.0}
+    # Swap main_app's time module only, as the dashboard tests do, so the event loop keeps the real clock
+    monkeypatch.setattr(dashboard, "time", SimpleNamespace(time=lambda: clock["now"]))
+    calls = []
+
+    async def mock_fetch_from_host(client, host_conf):
+        calls.append(host_conf["name"])
+        return [{"username": "fresh"}]
+
+    monkeypatch.setattr(dashboard, "_fetch_users_from_host", mock_fetch_from_host)
+    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", [{"name": "host1", "api_url": "http://h1"}])
+
+    assert await dashboard.fetch_users_list() == cached
+    assert calls == []
+
+    clock["now"] = 1_000_000.0
+    assert await dashboard.fetch_users_list() == [{"username": "fresh"}]
+    assert calls == ["host1"]
+    assert dashboard._users_cache["expiry"] == clock["now"] + dashboard.USERS_CACHE_TTL
+
 @pytest.mark.asyncio
 async def test_fetch_users_list_parallel(monkeypatch):
     # Setup
     dashboard._users_cache = {"data": [], "expiry": 0}
     
-    fetch_times = []
-    
+    hosts = [
+        {"name": "host1", "api_url": "http://h1"},
+        {"name": "host2", "api_url": "http://h2"},
+        {"name": "host3", "api_url": "http://h3"}
+    ]
+    # Each fetch returns only once all of them are in flight; a sequential fan-out never gets there
+    entered = []
+    all_entered = asyncio.Event()
+
     async def mock_fetch_from_host(client, host_conf):
-        fetch_times.append(time.time())
-        await asyncio.sleep(0.5)
+        entered.append(host_conf["name"])
+        if len(entered) == len(hosts):
+            all_entered.set()
+        await all_entered.wait()
         return [{"username": host_conf["name"]}]
 
     monkeypatch.setattr(dashboard, "_fetch_users_from_host", mock_fetch_from_host)
-    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", [
-        {"name": "host1", "api_url": "http://h1"},
-        {"name": "host2", "api_url": "http://h2"},
-        {"name": "host3", "api_url": "http://h3"}
-    ])
+    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", hosts)
     
-    start = time.time()
-    users = await dashboard.fetch_users_list()
-    duration = time.time() - start
-    
-    # If parallel, should take ~0.5s, not ~1.5s
-    assert duration < 1.0 
-    assert len(fetch_times) == 3
-    # Check that they were all started very close to each other
-    assert max(fetch_times) - min(fetch_times) < 0.1
+    users = await asyncio.wait_for(dashboard.fetch_users_list(), timeout=1.0)
+
+    assert sorted(entered) == ["host1", "host2", "host3"]
+    assert users
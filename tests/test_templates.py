@@ -1,6 +1,7 @@
-import json
+import functools
 import re
 
+import orjson
 import pytest
 
 import main_dashboard.main_app as dashboard
@@ -13,36 +14,31 @@ def sample_hosts_config():
     ]
 
 
+@functools.lru_cache(maxsize=None)
+def _json_script_pattern(script_id: str) -> re.Pattern:
+    return re.compile(rf'<script id="{re.escape(script_id)}" type="application/json">(.*?)</script>', re.DOTALL)
+
+
 def extract_json_script(rendered_html: str, script_id: str):
-    pattern = rf'<script id="{script_id}" type="application/json">(.*?)</script>'
-    match = re.search(pattern, rendered_html, re.DOTALL)
+    match = _json_script_pattern(script_id).search(rendered_html)
     assert match, f"Script tag with id '{script_id}' missing"
     json_payload = match.group(1).strip()
     assert json_payload, f"Script tag '{script_id}' contained no JSON"
-    return json.loads(json_payload)
+    return orjson.loads(json_payload)
 
 
-def test_overview_template_renders(sample_hosts_config, monkeypatch):
+@pytest.mark.parametrize(
+    "route,renderer,mode",
+    [
+        ("/", "overview_page", "overview"),
+        ("/detailed", "detailed_page", "detailed"),
+    ],
+)
+def test_dashboard_template_renders(route, renderer, mode, sample_hosts_config, monkeypatch):
     monkeypatch.setattr(dashboard, "MONITORED_HOSTS", sample_hosts_config)
-    with dashboard.app.test_request_context('/'):
-        rendered = dashboard.overview_page()
+    with dashboard.app.test_request_context(route):
+        rendered = getattr(dashboard, renderer)()
     hosts = extract_json_script(rendered, "initial-hosts-config")
     assert hosts == sample_hosts_config
-    assert "initializeDashboard(initialHostsConfig, 'overview')" in rendered
-
-
-def test_detailed_template_renders(sample_hosts_config, monkeypatch):
-    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", sample_hosts_config)
-    with dashboard.app.test_request_context('/detailed'):
-        rendered = dashboard.detailed_page()
-    hosts = extract_json_script(rendered, "initial-hosts-config")
-    assert hosts == sample_hosts_config
-    assert "initializeDashboard(initialHostsConfig, 'detailed')" in rendered
-
-
-def test_dashboard_settings_script_removed(sample_hosts_config, monkeypatch):
-    monkeypatch.setattr(dashboard, "MONITORED_HOSTS", sample_hosts_config)
-    with dashboard.app.test_request_context('/'):
-        rendered = dashboard.overview_page()
-
+    assert f"initializeDashboard(initialHostsConfig, '{mode}')" in rendered
     assert 'dashboard-settings' not in rendered